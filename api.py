@@ -30,10 +30,16 @@
 # The code here was written by Simon Parsons, based on examples from
 # the PacMan AI projects.
 
+from array import array
 from random import random
 from pacman import Directions
 import util
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 #
 # Parameters
 #
@@ -163,44 +169,215 @@ def food(state):
     # Return list of food that is visible
     return foodList
 
+class FoodTracker:
+    # The food and capsules left in one game, kept up to date move by
+    # move instead of scanning the whole food Grid like food() does.
+    #
+    # Create one from the first state of a game (in
+    # registerInitialState, say) and give it every state the agent
+    # sees after that:
+    #
+    # tracker = api.FoodTracker(state)
+    # ...
+    # foodEaten, foodAdded, capsulesEaten = tracker.update(state)
+    #
+    # update() returns what changed since the last state it was given,
+    # and tracker.food and tracker.capsules are the sets of (x, y)
+    # pairs left. Do not change these sets.
+    #
+    # The game marks the food and capsule eaten on a move in the
+    # _foodEaten and _capsuleEaten fields of the state (and food put
+    # back in _foodAdded), but each move of a ghost starts a new state
+    # with the marks cleared, so they are usually gone by the time the
+    # agent sees the state. Only Pacman eats, though, and it moves one
+    # cell per turn, so when the marks are gone it is enough to look at
+    # the cell Pacman is in. If Pacman has moved more than one cell
+    # since the last state, or the number of capsules has changed by
+    # more than the tracker saw, some states were missed and the Grid is
+    # scanned again. Both checks take constant time.
+    #
+    # They do not notice missed states after which Pacman is back next
+    # to where it was. FoodTracker(state, check=True) also compares the
+    # food left with the count of the food Grid on every update, which
+    # finds those too but reads the whole Grid, so it is meant for
+    # debugging and for agents that skip states.
+
+    def __init__(self, state, check=False):
+        self.check = check
+        self.rescan(state)
+
+    def rescan(self, state):
+        # Reads the food and capsules from scratch.
+        self.food = set(state.getFood().asList())
+        self.capsules = set([(int(x), int(y)) for (x, y) in state.getCapsules()])
+        self.position = state.getPacmanPosition()
+
+    def update(self, state):
+        # Brings the tracker up to date with state, and returns the
+        # lists of food eaten, food added and capsules eaten since the
+        # last state.
+
+        foodEaten = []
+        foodAdded = []
+        capsulesEaten = []
+        data = state.data
+        marked = data._foodEaten, data._capsuleEaten
+        if data._foodAdded is not None:
+            for cell in data._foodAdded:
+                if cell not in self.food:
+                    self.food.add(cell)
+                    foodAdded.append(cell)
+        # What Pacman ate on this move: the marks if they are still
+        # there, otherwise whatever has gone from Pacman's cell.
+        position = state.getPacmanPosition()
+        jumped = abs(position[0] - self.position[0]) + abs(position[1] - self.position[1]) > 1
+        self.position = position
+        x, y = int(position[0]), int(position[1])
+        cell = (x, y)
+        if cell in self.food and (marked[0] == cell or not state.getFood()[x][y]):
+            self.food.discard(cell)
+            foodEaten.append(cell)
+        if cell in self.capsules and (marked[1] == cell or cell not in state.getCapsules()):
+            self.capsules.discard(cell)
+            capsulesEaten.append(cell)
+
+        if jumped or len(self.capsules) != len(state.getCapsules()) or \
+           (self.check and len(self.food) != state.getNumFood()):
+            food = self.food | set(foodEaten)
+            capsules = self.capsules | set(capsulesEaten)
+            self.rescan(state)
+            foodAdded = list(self.food - food) + foodAdded
+            return list(food - self.food), foodAdded, list(capsules - self.capsules)
+        return foodEaten, foodAdded, capsulesEaten
+
+    def foodDelta(self, state):
+        # Just the food eaten and added since the last state.
+        foodEaten, foodAdded, capsulesEaten = self.update(state)
+        return foodEaten, foodAdded
+
+    def currentFood(self, state):
+        # The set of food left in state.
+        self.update(state)
+        return self.food
+
 def walls(state):
     # Returns a list of (x, y) pairs of wall positions
     #
     # This version just returns all the current wall locations
     # extracted from the state data.  In later versions, this will be
     # restricted by distance, and include some uncertainty.
+    #
+    # The list is a copy of the one in the wall index of the layout
+    # (see wallIndex), so the grid is only read once per layout.
     
-    wallList= []
-    wallGrid = state.getWalls()
-    width = wallGrid.width
-    height = wallGrid.height
-    for i in range(width):
-        for j in range(height):
-            if wallGrid[i][j] == True:
-                wallList.append((i, j))            
-    return wallList
+    return list(wallIndex(state).wallList)
 
 def corners(state):
     # Returns the coordinates of the four corners of the state space.
     #
     # For harder exploration we could obfusticate this information.
 
-    corners=[]
-    wallGrid = state.getWalls()
-    width = wallGrid.width
-    height = wallGrid.height
-    corners.append((0, 0))
-    corners.append((width-1, 0))
-    corners.append((0, height-1))
-    corners.append((width-1, height-1))
-    return corners
+    return list(wallIndex(state).corners)
                 
+class Observation(object):
+    # Everything the sensing functions above tell the agent about one
+    # state, read in one go by observe(). It cannot be changed: its
+    # fields are
+    #
+    # position    - whereAmI()
+    # legal       - legalActions(), as a tuple
+    # food        - food(), as a tuple
+    # capsules    - capsules(), as a tuple
+    # walls       - walls(), as a tuple shared by all the observations
+    #               of a layout
+    # corners     - corners(), as a tuple
+    # ghosts      - ghosts(), as a tuple
+    # ghostStates - ghostStatesWithTimes(), as a tuple
+    # width, height - the size of the layout
+    # flags       - an array('b') with one byte per cell, x * height + y,
+    #               holding the bits below for what is in the cell. Use
+    #               asArray() to see it as a NumPy array; do not change
+    #               it.
+    #
+    # Slots keep the object small, and since it never changes it can
+    # be kept, shared or put in a batch with the observations of other
+    # games.
+
+    WALL = 1
+    FOOD = 2
+    CAPSULE = 4
+    GHOST = 8
+    SCARED_GHOST = 16
+    PACMAN = 32
+
+    __slots__ = ["position", "legal", "food", "capsules", "walls", "corners", "ghosts", "ghostStates",
+                 "width", "height", "flags"]
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("An Observation cannot be changed")
+
+    def __delattr__(self, name):
+        raise AttributeError("An Observation cannot be changed")
+
+    def asArray(self):
+        # Returns flags as a read-only width x height NumPy array of
+        # int8, indexed [x][y], without copying it.
+        if np is None:
+            raise Exception("Observation.asArray requires NumPy, which is not installed")
+        view = np.frombuffer(self.flags, dtype=np.int8).reshape(self.width, self.height)
+        view.flags.writeable = False
+        return view
+
+def observe(state):
+    # Returns an Observation of state: what whereAmI(), legalActions(),
+    # food(), capsules(), walls(), corners(), ghosts() and
+    # ghostStatesWithTimes() would return, read in a single pass over
+    # the state. The walls and corners come from the wall index of the
+    # layout, and the flags start as a copy of its wall flags.
+
+    index = wallIndex(state)
+    height = index.height
+    flags = array('b', index.flags)
+
+    food = []
+    for x, column in enumerate(state.getFood().data):
+        for y, hasFood in enumerate(column):
+            if hasFood:
+                food.append((x, y))
+                flags[x * height + y] |= Observation.FOOD
+    capsules = tuple(state.getCapsules())
+    for (x, y) in capsules:
+        flags[int(x) * height + int(y)] |= Observation.CAPSULE
+
+    ghosts = []
+    ghostStates = []
+    for ghostState in state.getGhostStates():
+        position = ghostState.getPosition()
+        ghosts.append(position)
+        ghostStates.append((position, ghostState.scaredTimer))
+        flags[int(position[0]) * height + int(position[1])] |= \
+            Observation.SCARED_GHOST if ghostState.scaredTimer > 0 else Observation.GHOST
+
+    position = state.getPacmanPosition()
+    flags[int(position[0]) * height + int(position[1])] |= Observation.PACMAN
+    return Observation(position=position, legal=tuple(state.getLegalPacmanActions()), food=tuple(food),
+                       capsules=capsules, walls=index.walls, corners=index.corners, ghosts=tuple(ghosts),
+                       ghostStates=tuple(ghostStates), width=index.width, height=height, flags=flags)
+
 #
 # Acting
 #
-def makeMove(direction, legal):
+def makeMove(direction, legal, rng=None):
     # This version implements non-deterministic movement.
     #
+    # The random numbers come from rng, the random number generator of
+    # the game (state.getRandom()) if given, and from the random module
+    # otherwise.
+    #
     # Paacman has a probability of directionProb of moving in the
     # specified direction, and 0.5*(1 - directionProb) of moving
     # perpendicular to the specified direction. Any attempt to move in
@@ -220,7 +397,7 @@ def makeMove(direction, legal):
         # direction with probability directionProb.
         #
         # Otherwise make a different move.
-        sample = random()
+        sample = rng.random() if rng is not None else random()
         if sample <= directionProb:
             # Here the non-deterministic action selection says to
             # return the original move, but we need to check it is
@@ -234,7 +411,7 @@ def makeMove(direction, legal):
             else:
                 return Directions.STOP
         else:
-            return selectNewMove(direction, legal)
+            return selectNewMove(direction, legal, rng)
     else:
         # When actions are deterministic, Pacman moves in the
         # specified direction
@@ -261,59 +438,12 @@ def inFront(object, facing, state):
     # Returns true if the object is along the corridor in the
     # direction of the parameter "facing" before a wall gets in the
     # way.
-    
-    pacman = state.getPacmanPosition()
-    pacman_x = pacman[0]
-    pacman_y = pacman[1]
-    wallList = walls(state)
-
-    # If Pacman is facing North
-    if facing == Directions.NORTH:
-        # Check if the object is anywhere due North of Pacman before a
-        # wall intervenes.
-        next = (pacman_x, pacman_y + 1)
-        while not next in wallList:
-            if next == object:
-                return True
-            else:
-                next = (pacman_x, next[1] + 1)
-        return False
-
-    # If Pacman is facing South
-    if facing == Directions.SOUTH:
-        # Check if the object is anywhere due North of Pacman before a
-        # wall intervenes.
-        next = (pacman_x, pacman_y - 1)
-        while not next in wallList:
-            if next == object:
-                return True
-            else:
-                next = (pacman_x, next[1] - 1)
-        return False
+    #
+    # The corridors are looked up in the ray table of the layout (see
+    # WallIndex.raysFrom) rather than walked cell by cell.
 
-    # If Pacman is facing East
-    if facing == Directions.EAST:
-        # Check if the object is anywhere due East of Pacman before a
-        # wall intervenes.
-        next = (pacman_x + 1, pacman_y)
-        while not next in wallList:
-            if next == object:
-                return True
-            else:
-                next = (next[0] + 1, pacman_y)
-        return False
-    
-    # If Pacman is facing West
-    if facing == Directions.WEST:
-        # Check if the object is anywhere due West of Pacman before a
-        # wall intervenes.
-        next = (pacman_x - 1, pacman_y)
-        while not next in wallList:
-            if next == object:
-                return True
-            else:
-                next = (next[0] - 1, pacman_y)
-        return False
+    rays = wallIndex(state).raysFrom(state.getPacmanPosition())
+    return facing in rays and object in rays[facing]
 
 def atSide(object, facing, state):
     # Returns true if the object is in a side corridor perpendicular
@@ -357,10 +487,16 @@ def visible(objects, state):
 
     # This code creates partial observability by only returning some
     # of the members of objects.
+    #
+    # inFront and atSide would walk the corridors once per object, so
+    # this looks the objects up in the ray table of Pacman's cell
+    # instead: each ray maps the cells Pacman can see in one direction
+    # to their distance, which along a corridor is the same as the
+    # Manhattan distance distanceLimited measures.
     else:
         facing = state.getPacmanState().configuration.direction
-        visibleObjects = []
-        sideObjects = []
+        rays = wallIndex(state).raysFrom(state.getPacmanPosition())
+        tooFar = visibilityLimit + sideLimit + 1
         
         if facing != Directions.STOP:
             
@@ -368,16 +504,15 @@ def visible(objects, state):
             # and to the side (if there are any side corridors).
             
             # Objects in front. Visible up to "visibilityLimit"
-            for i in range(len(objects)):
-                if inFront(objects[i], facing, state):
-                    visibleObjects.append(objects[i])
-            visibleObjects = distanceLimited(visibleObjects, state, visibilityLimit)
-            
+            front = rays[facing]
+            visibleObjects = [o for o in objects if front.get(o, tooFar) <= visibilityLimit]
+
             # Objects to the side. Visible up to "sideLimit"
-            for i in range(len(objects)):
-                if atSide(objects[i], facing, state):
-                    sideObjects.append(objects[i])
-            sideObjects = distanceLimited(sideObjects, state, sideLimit)
+            if facing == Directions.NORTH or facing == Directions.SOUTH:
+                left, right = rays[Directions.WEST], rays[Directions.EAST]
+            else:
+                left, right = rays[Directions.NORTH], rays[Directions.SOUTH]
+            sideObjects = [o for o in objects if min(left.get(o, tooFar), right.get(o, tooFar)) <= sideLimit]
 
             # Combine lists.
             visibleObjects = visibleObjects + sideObjects
@@ -390,16 +525,8 @@ def visible(objects, state):
             # after the first move is made, so this code will not run
             # after the first move :-(
 
-            for i in range(len(objects)):
-                if inFront(objects[i], Directions.NORTH, state):
-                    visibleObjects.append(objects[i])
-                if inFront(objects[i], Directions.SOUTH, state):
-                    visibleObjects.append(objects[i])
-                if inFront(objects[i], Directions.EAST, state):
-                    visibleObjects.append(objects[i])
-                if inFront(objects[i], Directions.WEST, state):
-                    visibleObjects.append(objects[i])
-            visibleObjects = distanceLimited(visibleObjects, state, visibilityLimit)
+            visibleObjects = [o for o in objects
+                              if min([rays[d].get(o, tooFar) for d in WallIndex.directions]) <= visibilityLimit]
         return visibleObjects
 
 def audible(ghosts, state):
@@ -415,13 +542,13 @@ def union(a, b):
     #
     return list(set(a) | set(b))
 
-def selectNewMove(direction, legal):
+def selectNewMove(direction, legal, rng=None):
     # This function is called if Pacman isn't moving in the specified
     # direction. Need to pick another legal action.
 
     # Pick with 50% probability between the two perpendicular
-    # possibilities.
-    sample = random()
+    # possibilities, drawing from rng as makeMove does.
+    sample = rng.random() if rng is not None else random()
     if sample <= 0.5:
         left = True
     else:
@@ -481,3 +608,92 @@ def selectNewMove(direction, legal):
                 return Directions.STOP
 
     print "Why am I here?"
+
+#
+# Walls never change during a game, so they are indexed once per
+# layout rather than read from the wall Grid on every call.
+#
+class WallIndex:
+    # The walls of a layout, as:
+    #
+    # wallSet  - a frozenset of (x, y) pairs, to test for a wall in O(1)
+    # wallList - the list of (x, y) pairs that walls() returns, column
+    #            by column
+    # corners  - the four corners, as corners() returns them
+    # walls    - the wall list as a tuple, for observe()
+    # flags    - an array('b') with one byte per cell, x * height + y,
+    #            where walls have the WALL bit of Observation set
+    # rays     - the ray table (see raysFrom), built the first time
+    #            partial visibility needs it
+
+    # The directions Pacman can look in, and one step in each of them.
+    directions = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+    steps = {Directions.NORTH: (0, 1), Directions.SOUTH: (0, -1),
+             Directions.EAST: (1, 0), Directions.WEST: (-1, 0)}
+
+    def __init__(self, wallGrid):
+        self.width = wallGrid.width
+        self.height = wallGrid.height
+        self.wallList = wallGrid.asList()
+        self.wallSet = frozenset(self.wallList)
+        self.corners = ((0, 0), (self.width-1, 0), (0, self.height-1), (self.width-1, self.height-1))
+        self.walls = tuple(self.wallList)
+        self.flags = array('b', [0]) * (self.width * self.height)
+        for (x, y) in self.wallList:
+            self.flags[x * self.height + y] = Observation.WALL
+        self.rays = None
+
+    def isWall(self, position):
+        # True if there is a wall at the (x, y) pair position.
+        return position in self.wallSet
+
+    def raysFrom(self, position):
+        # Returns the rays from the (x, y) pair position: a dictionary
+        # that maps each direction to a dictionary of the cells along
+        # it, from the next cell up to the first wall, and their
+        # distance from position.
+        #
+        # The rays of every open cell are worked out the first time
+        # this is called, so the cost of a lookup no longer depends on
+        # how long the corridors are.
+
+        if self.rays is None:
+            self.rays = {}
+            for x in range(self.width):
+                for y in range(self.height):
+                    if (x, y) not in self.wallSet:
+                        self.rays[(x, y)] = self.castRays((x, y))
+        if position not in self.rays:
+            return self.castRays(position)
+        return self.rays[position]
+
+    def castRays(self, position):
+        # Walks the rays from position, as inFront always did.
+        rays = {}
+        for direction in self.directions:
+            dx, dy = self.steps[direction]
+            ray = {}
+            x, y = position[0] + dx, position[1] + dy
+            while 0 <= x < self.width and 0 <= y < self.height and (x, y) not in self.wallSet:
+                ray[(x, y)] = len(ray) + 1
+                x, y = x + dx, y + dy
+            rays[direction] = ray
+        return rays
+
+# The wall index of each layout, keyed by the text of the layout.
+#
+# The key cannot be the layout object: the state an agent is given is
+# a deep copy of the game's state, layout included, so every move
+# comes with a new layout object. The text of a copy is made of the
+# same strings, whose hashes Python keeps, so the key costs one tuple
+# of the rows.
+wallIndexCache = {}
+
+def wallIndex(state):
+    # Returns the WallIndex of the layout of the game, building it the
+    # first time the layout is seen.
+
+    key = tuple(state.data.layout.layoutText)
+    if key not in wallIndexCache:
+        wallIndexCache[key] = WallIndex(state.getWalls())
+    return wallIndexCache[key]
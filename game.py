@@ -383,6 +383,10 @@ class GameStateData:
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self.random = prevState.random
+        else:
+            # The random number generator of the game, shared by all its states (see pacman.runGames).
+            self.random = None
 
         self._foodEaten = None
         self._foodAdded = None
@@ -34,13 +34,182 @@ import api
 import random
 import game
 import util
+import csv
+import json
+import os
+import mdpCache
+import mdpSolvers
+import mdpModels
+import mdpParallel
+import mdpThreats
+import time
+
+def parseFlag(value):
+    """ Reads an on/off option, which is a string when it comes from the command line (-a).
+
+    Args:
+        value (bool/int/str): the value of the option.
+
+    Returns:
+        (bool): True if the option is on.
+    """    
+    return str(value).lower() in ["1", "true", "yes", "on"]
 
 class MDPAgent(Agent):
 
+    defaultCacheSize = 1000
+    statsFormats = ["jsonl", "csv"]
+    # Columns of the csv stats, one row per move (the residuals only go in the jsonl stats).
+    statsFields = ["game", "move", "x", "y", "solver", "cached", "timedOut", "sweeps", "updates", "residual",
+                   "buildSeconds", "populateSeconds", "solveSeconds", "actionSeconds"]
+
     # Constructor: this gets run when we first invoke pacman.py
-    def __init__(self):
+    #
+    # solver selects how the MDP is solved, and can be given from the
+    # command line with -a solver=... (engine=... is the same option under
+    # its older name). It is the name of a mdpSolvers.Solver registered in
+    # mdpSolvers.solvers:
+    #   python - the pure Python valueIteration below (default)
+    #   numpy  - the vectorized mdpSolvers.numpyValueIteration
+    #   sparse - mdpSolvers.sparseValueIteration over the transition
+    #            model built in registerInitialState
+    #   prioritized - mdpSolvers.prioritizedSweeping, which only updates
+    #            the utilities of the previous move around the cells whose
+    #            reward changed.
+    #   policy - mdpSolvers.policyIteration with exact policy evaluation
+    #   modifiedPolicy - modified policy iteration, evaluating each policy
+    #            with evaluationSweeps sweeps
+    #   local  - mdpSolvers.localValueIteration, which only solves the
+    #            cells within horizon moves of Pacman
+    #   corridor - mdpSolvers.corridorValueIteration, which iterates over
+    #            the junctions only and solves the corridors between them
+    #            in closed form (an approximation)
+    #   regions - mdpSolvers.regionValueIteration, which solves the regions
+    #            between articulation cells one at a time and reports at the
+    #            end of the game how many sweeps each region took
+    #   buffered - mdpSolvers.bufferedValueIteration, the sparse engine
+    #            working in arrays the agent allocates once per layout,
+    #            where it also keeps its rewards (it implies incrementalMap)
+    #   parallel - mdpParallel.StripSweeper, the sparse engine with every
+    #            sweep split over workers processes (one per core unless
+    #            workers=... says otherwise), for very large layouts
+    # Both policy iteration engines start from the previous move's policy.
+    # Starting from the previous move only pays off with a tolerance, so
+    # prioritized and modifiedPolicy use epsilon=mdpSolvers.defaultEpsilon unless
+    # told otherwise.
+    #
+    # warmStart=1 makes each move's solve start from the utilities of
+    # the previous move rather than from the entryMap, and
+    # reportWarmStart=1 also solves every move from scratch to print how
+    # many sweeps the warm start saved (this costs a second solve).
+    #
+    # epsilon=... stops value iteration once every utility is known to
+    # within epsilon (see mdpSolvers.StoppingRule) instead of waiting
+    # until nothing changes, and stableSweeps=k stops it once the best
+    # action at Pacman's cell has been the same for k sweeps.
+    #
+    # sweep=... chooses the order in which cells are updated:
+    #   jacobi      - every cell reads the utilities of the previous sweep (default)
+    #   gaussSeidel - cells are updated in place, row after row
+    #   redBlack    - in place, first the cells with an even x + y, then
+    #                 the odd ones (the only in-place order the numpy engine runs)
+    # Engines that update the cells in an order of their own (prioritized,
+    # both policy iteration engines, exact, local, corridor and regions)
+    # take no sweep option.
+    #
+    # moveTime=... gives every move a budget in seconds: once it is spent
+    # the engine stops between sweeps and the move is taken from the best
+    # utilities found so far. final() reports how often that happened.
+    #
+    # cacheSize=n keeps the solutions of the last n reward maps solved
+    # (see mdpCache.UtilityCache), so a map seen again, in this game or a
+    # later one, is not solved again. cacheFile=path also keeps them in
+    # that file between runs (with defaultCacheSize solutions unless
+    # cacheSize says otherwise). final() reports the cache hits and misses.
+    #
+    # stats=path records, for every move, the sweeps, the residual of
+    # every sweep, the cells updated and the time spent building the map,
+    # populating the rewards, solving and picking the action. final()
+    # appends them to that file, as one JSON object per line or, with
+    # statsFormat=csv, as one row per move (without the residuals).
+    #
+    # incrementalMap=1 keeps one entryMap for the whole game, built in
+    # registerInitialState, and on every move only repaints what changed:
+    # the food or capsule Pacman ate and the cells around the ghosts.
+    # The cells whose reward changed are left in dirtyCells, which the
+    # prioritized solver uses instead of comparing whole maps.
+    #
+    # threatRadius=k spreads the cost of every ghost over all the cells
+    # within k moves of it, fading with the maze distance (see
+    # mdpThreats.ThreatField), instead of only the ghost's cell and the
+    # cells next to it, and reads how long each ghost stays scared from
+    # its own state. It needs NumPy, and takes the same time per move
+    # whatever k is.
+    def __init__(self, engine="python", warmStart=False, reportWarmStart=False, epsilon=None, stableSweeps=None,
+                 sweep=None, evaluationSweeps=5, horizon=10, moveTime=None,
+                 cacheSize=None, cacheFile=None, solver=None, stats=None, statsFormat="jsonl",
+                 incrementalMap=False, workers=None, threatRadius=None):
         print "Starting up MDPAgent!"
         name = "Pacman"
+        self.engine = solver if solver is not None else engine
+        self.solver = mdpSolvers.getSolver(self.engine)
+        if self.solver.needsNumpy:
+            mdpSolvers.requireNumpy(self.engine)
+        if sweep is None:
+            sweep = self.solver.sweeps[0] if self.solver.sweeps else None
+        elif sweep not in mdpSolvers.sweepOrders:
+            raise Exception("Unknown sweep order: " + str(sweep) + ". Choose one of " + ", ".join(mdpSolvers.sweepOrders))
+        elif not self.solver.sweeps:
+            raise Exception("The " + self.engine + " solver updates the cells in its own order and takes no sweep option")
+        elif sweep not in self.solver.sweeps:
+            raise Exception("The " + self.engine + " solver cannot run " + sweep + " sweeps. Choose one of " + ", ".join(self.solver.sweeps))
+        self.sweep = sweep
+        self.reportWarmStart = parseFlag(reportWarmStart)
+        self.warmStart = parseFlag(warmStart) or self.reportWarmStart
+        if epsilon is None:
+            epsilon = self.solver.epsilon
+        self.epsilon = float(epsilon) if epsilon is not None else None
+        self.stableSweeps = int(stableSweeps) if stableSweeps is not None else None
+        self.previousValues = None
+        self.previousEntryMap = None
+        self.previousPolicy = None
+        self.evaluationSweeps = int(evaluationSweeps)
+        self.horizon = int(horizon)
+        if self.horizon < 1:
+            raise Exception("The horizon of the local engine must be at least 1")
+        self.workers = int(workers) if workers is not None else None
+        if self.workers is not None and self.workers < 1:
+            raise Exception("The parallel engine needs at least 1 worker")
+        self.threatRadius = int(threatRadius) if threatRadius is not None else None
+        if self.threatRadius is not None:
+            if self.threatRadius < 1:
+                raise Exception("The threat radius must be at least 1")
+            if mdpThreats.np is None:
+                raise Exception("threatRadius requires NumPy, which is not installed")
+        self.moveTime = float(moveTime) if moveTime is not None else None
+        if cacheSize is None and cacheFile is not None:
+            cacheSize = self.defaultCacheSize
+        self.cache = mdpCache.UtilityCache(int(cacheSize), cacheFile) if cacheSize is not None else None
+        if self.solver.volatile and (self.cache is not None or self.reportWarmStart):
+            raise Exception("The " + self.engine + " solver overwrites its utilities on every solve, so they cannot be cached or compared")
+        if statsFormat not in self.statsFormats:
+            raise Exception("Unknown stats format: " + str(statsFormat) + ". Choose one of " + ", ".join(self.statsFormats))
+        self.stats = stats
+        self.statsFormat = statsFormat
+        self.incrementalMap = parseFlag(incrementalMap)
+        ### The buffered solver reads the rewards straight from the agent's GridBuffers, where the entryMap
+        ### is kept for the whole game and repainted in place, as with incrementalMap.
+        self.gridBuffers = None
+        if self.solver.buffered:
+            self.incrementalMap = True
+        self.dirtyCells = None
+        self.moveStats = []
+        self.games = 0
+        self.sweeps = 0
+        self.residual = 0.0
+        self.savedSweeps = []
+        self.moves = 0
+        self.deadlineHits = 0
         self.discount = 0.6
         self.generalCost = -0.01 # Default cost for empty states
 
@@ -57,68 +226,353 @@ class MDPAgent(Agent):
         print "Running registerInitialState for MDPAgent!"
         print "I'm at:"
         print api.whereAmI(state)
+
+        # Walls never change during a game, so the transition model is
+        # built (or fetched from the cache) once per layout.
+        maxX, maxY = self.getMapSize(api.corners(state))
+        world = self.populateEntryMap(self.createEmptyMap(maxX, maxY, self.generalCost), [], [], api.walls(state), [], [])
+        self.transitionModel = mdpModels.getTransitionModel(world)
+        self.solverState = {}
+        self.regionSweeps = None
+
+        # Utilities of a previous game are no use as a starting point.
+        self.previousValues = None
+        self.previousEntryMap = None
+        self.previousPolicy = None
+        self.savedSweeps = []
+        self.moves = 0
+        self.deadlineHits = 0
+        self.moveStats = []
+        self.games += 1
+        if self.solver.buffered and (self.gridBuffers is None or self.gridBuffers.model is not self.transitionModel):
+            self.gridBuffers = mdpModels.GridBuffers(self.transitionModel)
+        if self.incrementalMap:
+            self.startEntryMap(state)
         
     # This is what gets run in between multiple games
     def final(self, state):
         print "Looks like the game just ended!"
+        if self.reportWarmStart and len(self.savedSweeps) > 0:
+            print "Warm start saved " + str(sum(self.savedSweeps)) + " sweeps over " + str(len(self.savedSweeps)) + " moves"
+        if self.regionSweeps is not None:
+            self.printRegionSweeps()
+        if self.cache is not None:
+            print "Utility cache: " + str(self.cache.hits) + " hits, " + str(self.cache.misses) + " misses, " + str(len(self.cache)) + " solutions kept"
+            self.cache.save()
+        if self.moveTime is not None:
+            print "Move deadline hit on " + str(self.deadlineHits) + " of " + str(self.moves) + " moves"
+        if self.stats is not None:
+            self.writeStats()
 
 
     def getAction(self, state):
         currentPosition = api.whereAmI(state)
-        food = api.food(state)
-        capsules = api.capsules(state)
-        walls = api.walls(state)
-        corners = api.corners(state)
-        ghosts = api.ghosts(state)
-        ghostStates = api.ghostStatesWithTimes(state)
 
-        ### Build an empty map
-        maxX = 0
-        maxY = 0
-        for i in range(len(corners)):
-            xCoordinate = corners[i][0]
-            yCoordinate = corners[i][1]
+        ### Build the map of rewards/costs of each cell
+        entryMap = self.getEntryMap(state)
 
-            maxX = xCoordinate if xCoordinate >= maxX else maxX
-            maxY = yCoordinate if yCoordinate >= maxY else maxY    
-        #Include walls in the coordinates.
-        maxX += 1
-        maxY += 1
+        ### Get Legal actions
+        legal = api.legalActions(state)
+
+        ### Solve the MDP, which also gives the best action
+        solution = self.solveMove(entryMap, currentPosition, legal)
+        bestAction = solution.action
+        if self.stats is not None:
+            self.recordMove(currentPosition, solution)
+
+        return api.makeMove(bestAction, legal, state.getRandom())
+
+    def getEntryMap(self, state):
+        """ Function that builds the entryMap of the current state: a 2D-Matrix with the reward/cost of every cell.
+            Without incrementalMap, everything it needs is read at once with api.observe.
+
+        Args:
+            state (GameState): the current state of the game.
+
+        Returns:
+            entryMap ([[float/None]]): the rewards/costs of each cell. Walls are set to None.
+        """        
+        if self.incrementalMap:
+            return self.updateEntryMap(state)
+
+        ### Read the state and build an empty map
+        start = time.time()
+        observation = api.observe(state)
+        food = observation.food
+        capsules = observation.capsules
+        walls = observation.walls
+        corners = observation.corners
+        ghosts = observation.ghosts
+        ghostStates = observation.ghostStates
+        maxX, maxY = self.getMapSize(corners)
         entryMap = self.createEmptyMap(maxX, maxY, self.generalCost)
+        built = time.time()
 
         ### Give rewards/costs to each cell in the entryMap
         entryMap = self.populateEntryMap(entryMap, food, capsules, walls, ghosts, ghostStates)
+        self.mapSeconds = (built - start, time.time() - built)
+        return entryMap
 
+    def startEntryMap(self, state):
+        """ Function that builds the entryMap that incrementalMap keeps for the whole game: food, capsules and
+            walls, but no ghosts yet (updateEntryMap paints them on every move). With the buffered solver
+            the entryMap is the rewardMap of the agent's GridBuffers, and no 2D-Matrix is built.
 
-        ### Get valueMap to base decisions on.
-        valueMap = self.valueIteration(entryMap)
-        
-        ### Get Legal actions
-        legal = api.legalActions(state)
+        Args:
+            state (GameState): the state at the start of the game.
+        """
+        self.foodTracker = api.FoodTracker(state)
+        if self.gridBuffers is not None:
+            self.gridBuffers.fill(self.gridBuffers.rewards, self.generalCost)
+            entryMap = self.gridBuffers.rewardMap()
+        else:
+            maxX, maxY = self.getMapSize(api.corners(state))
+            entryMap = self.createEmptyMap(maxX, maxY, self.generalCost)
+        self.entryMap = self.populateEntryMap(entryMap, self.foodTracker.food, self.foodTracker.capsules,
+                                              api.walls(state), [], [])
+        self.ghostPaint = {}
+
+    def updateEntryMap(self, state):
+        """ Function that brings the entryMap kept by incrementalMap up to date, changing only the cells that
+            need it. The result is the same as getEntryMap would build from scratch.
+
+            The food and capsules that went (or came back) since the last move come from an
+            api.FoodTracker, without scanning the food Grid. The cells around the ghosts of the previous
+            move get back their food/capsule/empty reward, and the ghosts are painted again where they
+            are now.
 
-        ### Based on the valueMap take the best action
-        bestAction = None 
-        for action in legal:
-            if action == Directions.NORTH:
-                if bestAction is None or valueMap[currentPosition[0]][currentPosition[1]+1] > bestAction[1]:
-                    bestAction = (action , valueMap[currentPosition[0]][currentPosition[1]+1])
-            if action == Directions.SOUTH:
-                if bestAction is None or valueMap[currentPosition[0]][currentPosition[1]-1] > bestAction[1]:
-                    bestAction = (action , valueMap[currentPosition[0]][currentPosition[1]-1])
-            if action == Directions.EAST:
-                if bestAction is None or valueMap[currentPosition[0]+1][currentPosition[1]] > bestAction[1]:
-                    bestAction = (action , valueMap[currentPosition[0]+1][currentPosition[1]])
-            if action == Directions.WEST:
-                if bestAction is None or valueMap[currentPosition[0]-1][currentPosition[1]] > bestAction[1]:
-                    bestAction = (action , valueMap[currentPosition[0]-1][currentPosition[1]])
-            if action == Directions.STOP:
-                if bestAction is None or valueMap[currentPosition[0]][currentPosition[1]] > bestAction[1]:
-                    bestAction = (action , valueMap[currentPosition[0]][currentPosition[1]])
+        Args:
+            state (GameState): the current state of the game.
+
+        Returns:
+            entryMap ([[float/None]]): the kept entryMap, which is changed in place on every move. The cells
+                                       whose reward changed since the last move are left in self.dirtyCells.
+        """
+        start = time.time()
+        changed = set(self.ghostPaint)
+        for cells in self.foodTracker.update(state):
+            changed.update(cells)
+
+        ghostStates = api.ghostStatesWithTimes(state)
+        self.ghostPaint = {}
+        for (x, y), value in self.ghostCosts([position for (position, scaredTime) in ghostStates], ghostStates):
+            if self.entryMap[x][y] is not None:
+                self.ghostPaint[(x, y)] = value
+        changed.update(self.ghostPaint)
+
+        self.dirtyCells = set()
+        for (x, y) in changed:
+            if (x, y) in self.ghostPaint:
+                value = self.ghostPaint[(x, y)]
+            elif (x, y) in self.foodTracker.capsules:
+                value = self.captulesReward
+            elif (x, y) in self.foodTracker.food:
+                value = self.foodReward
+            else:
+                value = self.generalCost
+            if self.entryMap[x][y] != value:
+                self.entryMap[x][y] = value
+                self.dirtyCells.add((x, y))
+        self.mapSeconds = (0.0, time.time() - start)
+        return self.entryMap
+
+    def solveMove(self, entryMap, position, legal):
+        """ Function that solves the MDP of this move, starting from the previous move's solution if asked to.
+
+        Args:
+            entryMap ([[float/None]]): the rewards/costs of each cell.
+            position ((int, int)): Pacman's position.
+            legal ([Directions]): Pacman's legal actions.
+
+        Returns:
+            (mdpSolvers.Solution): the solution of this move.
+        """        
+        ### Prioritized sweeping always starts from the previous move's utilities, policy iteration from its policy.
+        warmStart = self.warmStart or self.solver.warmStart
+        rule = self.stoppingRule(position, legal)
+
+        ### A reward map solved before with the same parameters needs no solving.
+        key = None
+        solution = None
+        if self.cache is not None:
+            start = time.time()
+            key = self.cacheKey(entryMap, position)
+            solution = self.cache.get(key)
+        cached = solution is not None
+        if cached:
+            found = time.time()
+            solution.action = mdpSolvers.greedyAction(lambda x, y: solution.values[x][y], position, legal)
+            solution.solveSeconds = found - start
+            solution.actionSeconds = time.time() - found
+        else:
+            solution = self.solve(entryMap, self.previousValues if warmStart else None, rule, position, legal)
+            if key is not None and not rule.timedOut:
+                self.cache.put(key, solution)
+            if solution.regionSweeps is not None:
+                if self.regionSweeps is None:
+                    self.regionSweeps = [0] * len(solution.regionSweeps)
+                self.regionSweeps = [total + sweeps for total, sweeps in zip(self.regionSweeps, solution.regionSweeps)]
+        self.moves += 1
+        if rule.timedOut:
+            self.deadlineHits += 1
+        self.lastRule = rule
+        self.lastCached = cached
+
+        ### Keep the solution to start from on the next move, and see what that saved on this one.
+        if warmStart:
+            if self.reportWarmStart and self.previousValues is not None and not cached:
+                coldSweeps = self.solve(entryMap, None, self.stoppingRule(position, legal), position).sweeps
+                self.savedSweeps.append(coldSweeps - solution.sweeps)
+                print "Warm start: " + str(solution.sweeps) + " sweeps instead of " + str(coldSweeps) + " (saved " + str(coldSweeps - solution.sweeps) + ")"
+            self.previousValues = solution.values
+            ### Utilities cut short by the deadline are not the solution of this entryMap.
+            self.previousEntryMap = entryMap if not rule.timedOut else None
+            self.previousPolicy = solution.policy
+        return solution
+
+
+    def recordMove(self, position, solution):
+        """ Function that keeps the stats of the move just played, to be written by writeStats.
+
+        Args:
+            position ((int, int)): Pacman's position.
+            solution (mdpSolvers.Solution): the solution of the move, as returned by solveMove.
+        """
+        buildSeconds, populateSeconds = self.mapSeconds
+        self.moveStats.append({
+            "game": self.games, "move": self.moves, "x": position[0], "y": position[1], "solver": self.engine,
+            "cached": self.lastCached, "timedOut": self.lastRule.timedOut, "sweeps": solution.sweeps,
+            "updates": solution.updates, "residual": solution.residual, "residuals": self.lastRule.residuals,
+            "buildSeconds": buildSeconds, "populateSeconds": populateSeconds,
+            "solveSeconds": solution.solveSeconds, "actionSeconds": solution.actionSeconds})
+
+    def writeStats(self):
+        """ Function that appends the stats of this game's moves to the stats file, in the stats format.
+        """
+        if self.statsFormat == "jsonl":
+            with open(self.stats, "a") as statsFile:
+                for record in self.moveStats:
+                    statsFile.write(json.dumps(record, sort_keys=True) + "\n")
+        else:
+            header = not os.path.exists(self.stats) or os.path.getsize(self.stats) == 0
+            with open(self.stats, "ab") as statsFile:
+                writer = csv.DictWriter(statsFile, self.statsFields, extrasaction="ignore")
+                if header:
+                    writer.writeheader()
+                writer.writerows(self.moveStats)
+        print "Stats of " + str(len(self.moveStats)) + " moves written to " + self.stats
+
+    def cacheKey(self, entryMap, position):
+        """ Function that builds the key of this move's solution in the utility cache.
+
+        Args:
+            entryMap ([[float/None]]): the rewards/costs of each cell.
+            position ((int, int)): Pacman's position, which only matters to positional solvers and to stableSweeps.
+
+        Returns:
+            (str): the fingerprint of the entryMap and of every option the solution depends on.
+        """
+        if not self.solver.positional and self.stableSweeps is None:
+            position = None
+        parameters = (self.engine, self.discount, self.epsilon, self.stableSweeps, self.sweep, self.evaluationSweeps,
+                      self.horizon, position)
+        return mdpCache.fingerprint(entryMap, parameters)
+
+    def stoppingRule(self, position, legal):
+        """ Function that builds the rule telling value iteration when to stop on this move.
+
+        Args:
+            position ((int, int)): Pacman's position.
+            legal ([Directions]): Pacman's legal actions.
+
+        Returns:
+            (mdpSolvers.StoppingRule): a fresh stopping rule using the epsilon, stableSweeps and moveTime options.
+        """        
+        deadline = time.time() + self.moveTime if self.moveTime is not None else None
+        return mdpSolvers.StoppingRule(self.discount, self.epsilon, self.stableSweeps, position, legal, deadline)
 
-        return api.makeMove(bestAction[0], legal)
+    def solve(self, entryMap, initialValues=None, rule=None, position=None, legal=None):
+        """ Function that solves the MDP with the solver chosen in the constructor.
+
+        Args:
+            entryMap ([[int/None]]): The entry map that holds the rewards in pacman world. 
+            initialValues ([[float/None]]): Utilities to start iterating from. Defaults to the entryMap.
+            rule (mdpSolvers.StoppingRule): When to stop iterating. Defaults to when nothing changes anymore.
+            position ((int, int)): Pacman's position, needed by the local engine and to pick an action.
+            legal ([Directions]): Pacman's legal actions, needed to pick an action.
+
+        Returns:
+            (mdpSolvers.Solution): the utilities of each cell, the number of sweeps it took, the final residual
+            and, given a position and legal actions, the best action.
+        """        
+        options = {"sweep": self.sweep, "epsilon": self.epsilon, "evaluationSweeps": self.evaluationSweeps, "horizon": self.horizon,
+                   "workers": self.workers, "boundary": self.boundaryEstimate(entryMap), "buffers": self.gridBuffers}
+        problem = mdpSolvers.Problem(self.transitionModel, entryMap, self.discount, position, legal, initialValues, rule,
+                                     options, self.solverState, self, self.previousEntryMap, self.previousPolicy,
+                                     self.dirtyCells if self.incrementalMap else None)
+        return self.solver.solve(problem)
+
+    def printRegionSweeps(self):
+        """ Function that prints the sweeps the regions engine spent on each region during the game,
+            busiest regions first, with the number of cells and the corners of each region.
+        """
+        model = self.transitionModel
+        regions = mdpModels.getRegionGraph(model).regions
+        print "Region sweeps over " + str(self.moves) + " moves:"
+        busiest = sorted(range(len(self.regionSweeps)), key=lambda g: -self.regionSweeps[g])
+        for g in busiest:
+            cells = [model.cells[c] for c in regions[g]]
+            corners = (min(cells), max(cells))
+            print "  region " + str(g) + ": " + str(len(cells)) + " cells from " + str(corners[0]) + " to " + str(corners[1]) + \
+                  ", " + str(self.regionSweeps[g]) + " sweeps (" + str(self.regionSweeps[g] * len(cells)) + " updates)"
+
+    def boundaryEstimate(self, entryMap):
+        """ Function that builds a cheap estimate of the utility of cells the local solver does not solve.
+            A cell d moves away from the nearest food or capsule is worth about d steps of generalCost 
+            followed by staying on the food forever.
+
+            d is found with a breadth-first search from the cell that gives up after horizon moves (taking
+            d = horizon + 1 if no food is that close), so an estimate costs the same however large the board
+            is and however much food is left. Estimates are kept, as each boundary cell is asked for once.
 
+        Args:
+            entryMap ([[float/None]]): the rewards/costs of each cell.
 
-    def valueIteration(self, entryMap):
+        Returns:
+            (function): estimate(x, y) returns the estimated utility of cell (x, y).
+        """        
+        model = self.transitionModel
+        targets = [self.foodReward, self.captulesReward]
+        estimates = {}
+        def estimate(x, y):
+            if (x, y) not in estimates:
+                start = model.index[x][y]
+                distance = 0
+                frontier = [start]
+                seen = set(frontier)
+                while not any([entryMap[cx][cy] in targets for (cx, cy) in [model.cells[c] for c in frontier]]):
+                    distance += 1
+                    if distance > self.horizon:
+                        break
+                    following = []
+                    for c in frontier:
+                        for n in model.neighbours(c):
+                            if n not in seen:
+                                seen.add(n)
+                                following.append(n)
+                    frontier = following
+                    if not frontier:
+                        distance = None
+                        break
+                if distance is None:
+                    estimates[(x, y)] = self.generalCost / (1 - self.discount)
+                else:
+                    estimates[(x, y)] = (self.generalCost * (1 - self.discount ** distance) +
+                                         self.discount ** distance * self.foodReward) / (1 - self.discount)
+            return estimates[(x, y)]
+        return estimate
+
+    def valueIteration(self, entryMap, initialValues=None, rule=None, sweep="jacobi"):
         """ Function that applies value iteration over the entry map to calculate the utility the of 
             each cell in pacman's world. 
             This is needed to solve the MDP
@@ -127,21 +581,40 @@ class MDPAgent(Agent):
             entryMap ([[int/None]]): The entry map that holds the rewards in pacman world. 
             It is a 2D-Matrix where each element is indexed by its coordinate and holds either an integer 
             representing the reward/cost of a cell or None if that coordinate is not a legal move (it is a wall)
+            initialValues ([[float/None]]): Utilities to start iterating from, e.g. the ones of the previous move. 
+            Defaults to the entryMap.
+            rule (mdpSolvers.StoppingRule): When to stop iterating. Defaults to when no state changes anymore.
+            sweep (str): The order in which cells are updated (see mdpSolvers.sweepOrders). "jacobi" reads a copy 
+            of the previous sweep, the other orders update the matrix in place.
 
         Returns:
             values ([[int/None]]): Returns a 2D-Matrix that holds the utilities of each cell (cooridnate) 
-            in pacman's world.
+            in pacman's world. The number of sweeps it took is left in self.sweeps and the largest change 
+            in the last sweep in self.residual.
         """        
-        #Initialize the values to be a copy of entryMap. This is so to skip the first step in the iteration phase below.
-        values = [row[:] for row in entryMap]
+        if rule is None:
+            rule = mdpSolvers.StoppingRule(self.discount)
 
-        #Iterate till no state (value) will change anymore
+        #Initialize the values to be a copy of entryMap. This is so to skip the first step in the iteration phase below.
+        if initialValues is None:
+            values = [row[:] for row in entryMap]
+        else:
+            values = [row[:] for row in initialValues]
+
+        #Iterate till the stopping rule is met (by default, till no state (value) will change anymore)
+        cells = mdpSolvers.sweepOrder(len(values)-1, len(values[0])-1, sweep)
+        self.sweeps = 0
         while True:
-            # Make a copy of values before iterating once again.
-            oldValues = [row[:] for row in values]
+            if sweep == "jacobi":
+                # Make a copy of values before iterating once again.
+                oldValues = [row[:] for row in values]
+            else:
+                # In-place sweeps read the neighbours' values as soon as they are updated.
+                oldValues = values
+            self.sweeps += 1
+            self.residual = 0.0
 
-            for i in range(len(values)-1):
-                for j in range(len(values[i])-1):
+            for i, j in cells:
 
                         if values[i][j] is not None:
                             # Extract legal actions in this state
@@ -151,17 +624,12 @@ class MDPAgent(Agent):
                             bestActionUtility = self.getActionWithHighestUtility(i, j, possibleActions, oldValues)
 
                             newUtility = entryMap[i][j] + self.discount * bestActionUtility
-                            values[i][j] = newUtility
 
-            #Check if this new value matrix is the same as the old one
-            different = False
-            for i in range(len(values)-1):
-                for j in range(len(values[i])-1):
-                    if values[i][j] is not None and float(values[i][j]) != float(oldValues[i][j]):
-                        different = True
-                        break
+                            #Keep track of how far this new value matrix is from the old one
+                            self.residual = max(self.residual, abs(float(newUtility) - float(values[i][j])))
+                            values[i][j] = newUtility
 
-            if not different:
+            if rule.done(self.residual, lambda x, y: values[x][y]):
                 return values
 
 
@@ -324,6 +792,28 @@ class MDPAgent(Agent):
 
         return bestActionUtility
 
+    def getMapSize(self, corners):
+        """ Function that works out the size of pacman's world from its corners.
+
+        Args:
+            corners ([(int, int)]): coordinates of the four corners of pacman's world
+
+        Returns:
+            maxX, maxY (int, int): number of columns and rows of pacman's world, walls included.
+        """        
+        maxX = 0
+        maxY = 0
+        for i in range(len(corners)):
+            xCoordinate = corners[i][0]
+            yCoordinate = corners[i][1]
+
+            maxX = xCoordinate if xCoordinate >= maxX else maxX
+            maxY = yCoordinate if yCoordinate >= maxY else maxY    
+        #Include walls in the coordinates.
+        maxX += 1
+        maxY += 1
+        return maxX, maxY
+
     def createEmptyMap(self, rowCount, colCount, value):
         """ Function that initializes an entryMap (a 2D-Matrix) and fills it with a given value.
 
@@ -368,33 +858,8 @@ class MDPAgent(Agent):
 
 
         ### Add some cost values to ghosts in the map.
-        for ghost in ghosts:
-            scaredTime = 0
-            for i, g in enumerate(ghostStates):
-                if g == ghost:
-                    scaredTime = ghostStates[i][1]
-                    break
-            # If a ghost has a scared time < 2, it will be assigned a cost value of -5 in the entryMap
-            if scaredTime < 2:
-                entryMap[int(ghost[0])][int(ghost[1])] = self.hungryGhostReward
-                # # What stays one cell close to them will have cost of -3
-                entryMap[int(ghost[0]) + 1][int(ghost[1])] = self.nextToHungryGhostReward if entryMap[int(ghost[0]) + 1][int(ghost[1])] is not None else None
-                entryMap[int(ghost[0]) - 1][int(ghost[1])] = self.nextToHungryGhostReward if entryMap[int(ghost[0]) - 1][int(ghost[1])] is not None else None
-                entryMap[int(ghost[0])][int(ghost[1]) + 1] = self.nextToHungryGhostReward if entryMap[int(ghost[0])][int(ghost[1]) + 1] is not None else None
-                entryMap[int(ghost[0])][int(ghost[1]) - 1] = self.nextToHungryGhostReward if entryMap[int(ghost[0])][int(ghost[1]) - 1] is not None else None
-                continue
-            # If a ghost has a scared time equal to 2, it will be assigned a cost value of -1 in the entryMap
-            if scaredTime == 2:
-                entryMap[int(ghost[0])][int(ghost[1])] = self.aboutHungryGhostReward
-                # # What stays one cell close to them will have cost of -10
-                entryMap[int(ghost[0]) + 1][int(ghost[1])] = self.nextToAboutHungryGhostReward if entryMap[int(ghost[0]) + 1][int(ghost[1])] is not None else None
-                entryMap[int(ghost[0]) - 1][int(ghost[1])] = self.nextToAboutHungryGhostReward if entryMap[int(ghost[0]) - 1][int(ghost[1])] is not None else None
-                entryMap[int(ghost[0])][int(ghost[1]) + 1] = self.nextToAboutHungryGhostReward if entryMap[int(ghost[0])][int(ghost[1]) + 1] is not None else None
-                entryMap[int(ghost[0])][int(ghost[1]) - 1] = self.nextToAboutHungryGhostReward if entryMap[int(ghost[0])][int(ghost[1]) - 1] is not None else None
-                continue
-            # If a ghost has a scared time > 2, it will be ignored
-            if scaredTime > 2:
-                continue
+        for (x, y), value in self.ghostCosts(ghosts, ghostStates):
+            entryMap[x][y] = value if entryMap[x][y] is not None else None
         
         ### Set walls in the entryMap to be None.
         for wall in walls:
@@ -402,6 +867,65 @@ class MDPAgent(Agent):
         
         return entryMap
 
+    def ghostCosts(self, ghosts, ghostStates):
+        """ Function that works out the costs all the ghosts put on the cells around them, with
+            ghostRewards or, given a threatRadius, with the threat field of the layout.
+
+        Args:
+            ghosts ([(int, int)]): list of coordinates for all the ghosts in pacman's world
+            ghostStates ([((int,int),int)]): A list of ghost states, with scared times.
+
+        Returns:
+            ([((int, int), float)]): (cell, cost) pairs, to be applied in order.
+        """
+        if self.threatRadius is None:
+            costs = []
+            for ghost in ghosts:
+                costs.extend(self.ghostRewards(ghost, ghostStates))
+            return costs
+        if not ghostStates:
+            return []
+
+        # Threat level 0 is a hungry ghost (scared time < 2) and 1 a ghost about to be hungry again
+        # (scared time 2). Ghosts scared for longer are ignored. The scared times are read from
+        # ghostStates directly; ghostRewards compares a ghost's position with a whole ghost state,
+        # never finds it, and so treats every ghost as hungry.
+        levels = [((int(x), int(y)), 0 if scaredTime < 2 else 1)
+                  for (x, y), scaredTime in ghostStates if scaredTime <= 2]
+        field = mdpThreats.getThreatField(self.transitionModel, self.threatRadius,
+                                          [(self.hungryGhostReward, self.nextToHungryGhostReward),
+                                           (self.aboutHungryGhostReward, self.nextToAboutHungryGhostReward)])
+        return field.costs(levels)
+
+    def ghostRewards(self, ghost, ghostStates):
+        """ Function that works out the costs a ghost puts on its cell and on the cells next to it.
+
+        Args:
+            ghost ((int, int)): coordinates of the ghost.
+            ghostStates ([((int,int),int)]): A list of ghost states.
+
+        Returns:
+            ([((int, int), float)]): (cell, cost) pairs, the ghost's cell first. Empty for a ghost that is ignored.
+        """
+        scaredTime = 0
+        for i, g in enumerate(ghostStates):
+            if g == ghost:
+                scaredTime = ghostStates[i][1]
+                break
+        x, y = int(ghost[0]), int(ghost[1])
+        # If a ghost has a scared time < 2, it will be assigned a cost value of -5 in the entryMap
+        # and what stays one cell close to them will have cost of -3
+        if scaredTime < 2:
+            return [((x, y), self.hungryGhostReward)] + \
+                   [(cell, self.nextToHungryGhostReward) for cell in [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]]
+        # If a ghost has a scared time equal to 2, it will be assigned a cost value of -2 in the entryMap
+        # and what stays one cell close to them will have cost of -1
+        if scaredTime == 2:
+            return [((x, y), self.aboutHungryGhostReward)] + \
+                   [(cell, self.nextToAboutHungryGhostReward) for cell in [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]]
+        # If a ghost has a scared time > 2, it will be ignored
+        return []
+
     def prettyPrintMatrix(self, mat):
         """ Debugging function to print out a matrix in a nice way.
 
@@ -409,4 +933,19 @@ class MDPAgent(Agent):
             mat ([[number]]): matrix to be printed.
         """        
         print('\n'.join([''.join(['{:6}'.format(float('%.1g' %item)) if item is not None else '{:6}'.format(item) for item in row]) for row in mat]))
-    
\ No newline at end of file
+    
+
+def pythonValueIteration(problem):
+    """ The solver registered as "python": MDPAgent.valueIteration of the agent asking.
+
+    Args:
+        problem (mdpSolvers.Problem): the MDP of the move, with the agent that asks for it.
+
+    Returns:
+        (mdpSolvers.Solution): the utilities, with the sweeps and the residual of the last sweep.
+    """
+    agent = problem.agent
+    values = agent.valueIteration(problem.entryMap, problem.initialValues, problem.rule, problem.option("sweep", "jacobi"))
+    return mdpSolvers.Solution(values, agent.sweeps, agent.residual)
+
+mdpSolvers.registerSolver(mdpSolvers.Solver("python", pythonValueIteration))
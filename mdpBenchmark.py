@@ -0,0 +1,178 @@
+# mdpBenchmark.py
+#
+# Measures how the engines of MDPAgent (mdpAgents.py) compare with the
+# original value iteration: for every layout, a few moves of a game are
+# played and, on every move, each engine solves the same MDP. For each
+# engine this reports the time spent solving, the sweeps over the grid
+# and how often its policy agrees with the one of valueIteration. With
+# -x it also solves every move exactly (with the exact solver) and
+# reports how far the utilities of each engine drift from the exact ones.
+#
+# Usage:
+#
+#   python mdpBenchmark.py
+#   python mdpBenchmark.py -l mediumClassic,originalClassic -m 20
+#   python mdpBenchmark.py -e "sparse;policy;modifiedPolicy"
+#   python mdpBenchmark.py -l smallGrid,tinyMaze,testClassic -e "local;corridor;sparse,epsilon=0.01" -x
+#
+# As required by the licensing agreement for the PacMan AI we have:
+#
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+import os
+import random
+import sys
+import time
+
+import api
+import ghostAgents
+import layout
+import mdpAgents
+import mdpSolvers
+import util
+from pacman import GameState
+
+
+def cellPolicy(model, values):
+    """ The action MDPAgent would pick in every open cell, given some utilities.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        values ([[float/None]]): utilities indexed as values[x][y].
+
+    Returns:
+        ([Directions]): the greedy action of each cell, indexed as model.cells.
+    """
+    policy = []
+    for c, cell in enumerate(model.cells):
+        legal = [model.actions[r] for r in range(model.actionStart[c], model.actionStart[c + 1])]
+        policy.append(mdpSolvers.greedyAction(lambda x, y: values[x][y], cell, legal))
+    return policy
+
+
+def largestError(model, values, exactValues):
+    """ The largest difference between some utilities and the exact ones, over the cells that have one.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        values ([[float/None]]): utilities indexed as values[x][y] (None where an engine has none).
+        exactValues ([[float/None]]): the exact utilities.
+
+    Returns:
+        (float): the largest absolute difference.
+    """
+    return max([abs(float(values[x][y]) - exactValues[x][y]) for (x, y) in model.cells if values[x][y] is not None])
+
+
+def benchmarkLayout(layoutName, engines, moves, seed, exact=False):
+    """ Plays up to moves moves on a layout, solving each one with valueIteration and every engine.
+        The game follows the actions of valueIteration, so all engines see the same states.
+
+    Args:
+        layoutName (str): name of a layout in layouts/.
+        engines ([str]): names of MDPAgent engines (or "engine,option=value,..." specs) to compare.
+        moves (int): largest number of moves to play.
+        seed (int): seed of the random numbers, so that every run plays the same game.
+        exact (bool): also compare the utilities of every engine with the exact ones.
+
+    Returns:
+        ({str: [float, int, float, float]}): for "valueIteration" and every engine, the seconds spent solving,
+                                             the sweeps, the fraction of cells where the policy agrees and,
+                                             with exact, the largest error of a utility (None otherwise).
+    """
+    random.seed(seed)
+    theLayout = layout.getLayout(layoutName)
+    state = GameState()
+    state.initialize(theLayout, theLayout.getNumGhosts())
+    ghosts = [ghostAgents.RandomGhost(i + 1) for i in range(state.getNumAgents() - 1)]
+
+    names = ["valueIteration"] + engines
+    util.mutePrint()
+    try:
+        agents = [mdpAgents.MDPAgent()]
+        for engine in engines:
+            options = dict([option.split("=") for option in engine.split(",")[1:]])
+            agents.append(mdpAgents.MDPAgent(engine=engine.split(",")[0], **options))
+        for agent in agents:
+            agent.registerInitialState(state)
+    finally:
+        util.unmutePrint()
+    model = agents[0].transitionModel
+    results = dict([(name, [0.0, 0, 0.0, 0.0 if exact else None]) for name in names])
+
+    played = 0
+    while played < moves and not (state.isWin() or state.isLose()):
+        position = api.whereAmI(state)
+        legal = api.legalActions(state)
+        policies = []
+        exactValues = None
+        for name, agent in zip(names, agents):
+            entryMap = agent.getEntryMap(state)
+            if exact and exactValues is None:
+                exactValues = mdpSolvers.policyIteration(model, entryMap, agent.discount,
+                                                         evaluate=mdpSolvers.evaluatePolicySparse).values
+            start = time.time()
+            solution = agent.solveMove(entryMap, position, legal)
+            results[name][0] += time.time() - start
+            results[name][1] += solution.sweeps
+            policies.append(cellPolicy(model, solution.values))
+            if exact:
+                results[name][3] = max(results[name][3], largestError(model, solution.values, exactValues))
+            if name == "valueIteration":
+                values = solution.values
+        for name, policy in zip(names, policies):
+            agreeing = len([1 for mine, theirs in zip(policy, policies[0]) if mine == theirs])
+            results[name][2] += agreeing / float(len(model.cells))
+        played += 1
+
+        # Move on following valueIteration, then let the ghosts move.
+        action = api.makeMove(mdpSolvers.greedyAction(lambda x, y: values[x][y], position, legal), legal)
+        state = state.generateSuccessor(0, action)
+        for ghost in ghosts:
+            if state.isWin() or state.isLose():
+                break
+            state = state.generateSuccessor(ghost.index, ghost.getAction(state))
+
+    for name in names:
+        results[name][2] /= max(played, 1)
+    return results
+
+
+def allLayouts():
+    """ Names of all the layouts in layouts/. """
+    return sorted([name[:-4] for name in os.listdir("layouts") if name.endswith(".lay")])
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    parser = OptionParser("python mdpBenchmark.py <options>")
+    parser.add_option('-l', '--layouts', dest='layouts', help='comma separated layouts [Default: all in layouts/]', default=None)
+    parser.add_option('-e', '--engines', dest='engines', help='engines to compare with valueIteration, separated by ";" [Default: %default]',
+                      default='policy;modifiedPolicy')
+    parser.add_option('-m', '--moves', dest='moves', type='int', help='moves to play on each layout [Default: %default]', default=5)
+    parser.add_option('-s', '--seed', dest='seed', type='int', help='random seed [Default: %default]', default=0)
+    parser.add_option('-x', '--exact', dest='exact', action='store_true', help='report the largest error against the exact utilities',
+                      default=False)
+    options, otherjunk = parser.parse_args(sys.argv[1:])
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+
+    layouts = options.layouts.split(',') if options.layouts else allLayouts()
+    engines = options.engines.split(';')
+    print "%-22s %-28s %10s %8s %10s" % ("Layout", "Engine", "Time (s)", "Sweeps", "Agreement") + \
+          (" %10s" % "Max error" if options.exact else "")
+    for layoutName in layouts:
+        results = benchmarkLayout(layoutName, engines, options.moves, options.seed, options.exact)
+        for name in ["valueIteration"] + engines:
+            seconds, sweeps, agreement, error = results[name]
+            print "%-22s %-28s %10.3f %8d %9.1f%%" % (layoutName, name, seconds, sweeps, 100 * agreement) + \
+                  (" %10.2e" % error if options.exact else "")
@@ -0,0 +1,116 @@
+# mdpCache.py
+#
+# A cache of the solutions MDPAgent (mdpAgents.py) has already computed,
+# so that a reward map seen before (the same food left, the ghosts back
+# in their starting cells) is not solved again.
+#
+# As required by the licensing agreement for the PacMan AI we have:
+#
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+import copy
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+
+def fingerprint(entryMap, parameters):
+    """ A short key that identifies a reward map solved with some solver parameters.
+
+        It is a hash of the text of both, so the same map gives the same key in every run of the program,
+        which is what allows keeping the cache on disk.
+
+    Args:
+        entryMap ([[float/None]]): 2D-Matrix of rewards indexed by [x][y], with walls set to None.
+        parameters (tuple): everything else the solution depends on (engine, discount, epsilon, ...).
+
+    Returns:
+        (str): the key.
+    """
+    return hashlib.sha1(repr(parameters) + repr(entryMap)).hexdigest()
+
+
+class UtilityCache:
+    """ Least recently used cache of solutions, keyed by fingerprint.
+
+        It holds at most maxSize solutions: storing one more drops the one that was used least recently.
+        hits and misses count how many lookups found a solution and how many did not. With a path, the
+        cache is read from that file when created (if it exists) and written back by save, so that runs on
+        the same layout can share it.
+    """
+
+    def __init__(self, maxSize, path=None):
+        """
+        Args:
+            maxSize (int): largest number of solutions kept (at least 1).
+            path (str): file the cache is kept in between runs, or None to keep it in memory only.
+        """
+        if maxSize < 1:
+            raise Exception("The utility cache must be able to hold at least one solution")
+        self.maxSize = maxSize
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if path is not None and os.path.exists(path):
+            with open(path, "rb") as cacheFile:
+                for key, solution in pickle.load(cacheFile):
+                    self.put(key, solution)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """ Looks a solution up, marking it as the most recently used.
+
+        Args:
+            key (str): the fingerprint of the reward map and parameters.
+
+        Returns:
+            (mdpSolvers.Solution): a copy of the cached solution, which the caller can annotate with the
+                                   action and timings of its move, or None if there is none.
+        """
+        solution = self.entries.pop(key, None)
+        if solution is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries[key] = solution
+        return copy.copy(solution)
+
+    def put(self, key, solution):
+        """ Stores a solution, dropping the least recently used one if the cache is full.
+
+            The cache keeps a copy without the action and timings of the move that solved it, which
+            belong to that move only. The utilities are shared, and must not be changed afterwards.
+
+        Args:
+            key (str): the fingerprint of the reward map and parameters.
+            solution (mdpSolvers.Solution): the solution.
+        """
+        solution = copy.copy(solution)
+        solution.action = None
+        solution.solveSeconds = 0.0
+        solution.actionSeconds = 0.0
+        self.entries.pop(key, None)
+        self.entries[key] = solution
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    def save(self):
+        """ Writes the cache to its file, least recently used solutions first. Does nothing without a path.
+        """
+        if self.path is None:
+            return
+        with open(self.path, "wb") as cacheFile:
+            pickle.dump(list(self.entries.items()), cacheFile, pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,288 @@
+# mdpChecks.py
+#
+# Checks that the faster ways MDPAgent (mdpAgents.py) and api.py now do
+# things give exactly the same results as the plain ones they replaced.
+# Random games are played on a few layouts and, on every state of them:
+#
+#   engines      - the utilities of the numpy, sparse, buffered and
+#                  parallel engines are compared with those of the
+#                  Python valueIteration loop;
+#   map          - the EntryMap kept up to date by incrementalMap=1 is
+#                  compared with one built from scratch;
+#   visibility   - api.visible, api.inFront and api.atSide, which look
+#                  the corridors up in ray tables, are compared with a
+#                  walk along the corridors cell by cell;
+#   food         - the food and capsules of an api.FoodTracker are
+#                  compared with a scan of the whole grid, both when it
+#                  is given every state and when it misses most of them.
+#
+# Every check prints the states it looked at and how many of them did
+# not match, and the script exits with status 1 if any did.
+#
+# Usage:
+#
+#   python mdpChecks.py
+#   python mdpChecks.py -c map,visibility,food -l mediumClassic -m 1000
+#   python mdpChecks.py -c engines -e "numpy;sparse,sweep=gaussSeidel"
+#
+# As required by the licensing agreement for the PacMan AI we have:
+#
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+import random
+import sys
+
+import api
+import layout
+import mdpAgents
+import util
+from game import Directions
+from pacman import GameState
+
+
+def randomGames(layoutName, states, rng):
+    """ Plays games on a layout where Pacman and the ghosts pick their moves at random, until enough states
+        have been seen.
+
+    Args:
+        layoutName (str): name of a layout in layouts/.
+        states (int): number of states wanted, over all the games.
+        rng (random.Random): where the random moves come from.
+
+    Returns:
+        ([[GameState]]): the states Pacman had to move in, game by game. Like the ones Game.run gives an
+                         agent, each is a copy of the game's state.
+    """
+    theLayout = layout.getLayout(layoutName)
+    if theLayout is None:
+        raise Exception("The layout " + layoutName + " cannot be found")
+    games = []
+    seen = 0
+    while seen < states:
+        state = GameState()
+        state.initialize(theLayout, theLayout.getNumGhosts())
+        game = []
+        while seen < states and not (state.isWin() or state.isLose()):
+            game.append(state.deepCopy())
+            seen += 1
+            state = state.generateSuccessor(0, rng.choice(state.getLegalPacmanActions()))
+            for ghost in range(1, state.getNumAgents()):
+                if state.isWin() or state.isLose():
+                    break
+                state = state.generateSuccessor(ghost, rng.choice(state.getLegalActions(ghost)))
+        games.append(game)
+    return games
+
+
+def startAgent(state, **options):
+    """ Makes an MDPAgent with some options and starts it on the first state of a game, without letting it print. """
+    util.mutePrint()
+    try:
+        agent = mdpAgents.MDPAgent(**options)
+        agent.registerInitialState(state)
+    finally:
+        util.unmutePrint()
+    return agent
+
+
+def checkEngines(games, engines):
+    """ Solves every state with the Python loop and with every engine, and compares the utilities.
+
+    Args:
+        games ([[GameState]]): the states, game by game.
+        engines ([str]): names of MDPAgent engines (or "engine,option=value,..." specs).
+
+    Returns:
+        ({str: [int, int, float]}): for every engine, the states solved, the states where a utility was not
+                                    the same as the Python loop's, and the largest difference.
+    """
+    results = dict([(engine, [0, 0, 0.0]) for engine in engines])
+    for game in games:
+        reference = startAgent(game[0])
+        agents = []
+        for engine in engines:
+            options = dict([option.split("=") for option in engine.split(",")[1:]])
+            agents.append(startAgent(game[0], engine=engine.split(",")[0], **options))
+        cells = reference.transitionModel.cells
+        for state in game:
+            position = api.whereAmI(state)
+            legal = api.legalActions(state)
+            values = reference.solveMove(reference.getEntryMap(state), position, legal).values
+            for engine, agent in zip(engines, agents):
+                other = agent.solveMove(agent.getEntryMap(state), position, legal).values
+                difference = max([abs(float(other[x][y]) - values[x][y]) for (x, y) in cells])
+                results[engine][0] += 1
+                if [float(other[x][y]) for (x, y) in cells] != [values[x][y] for (x, y) in cells]:
+                    results[engine][1] += 1
+                results[engine][2] = max(results[engine][2], difference)
+    return results
+
+
+def checkIncrementalMap(games):
+    """ Compares, on every state, the EntryMap kept by incrementalMap=1 with one built from scratch.
+
+    Args:
+        games ([[GameState]]): the states, game by game.
+
+    Returns:
+        ((int, int)): the states looked at and the ones where the two maps differ.
+    """
+    states = 0
+    mismatches = 0
+    for game in games:
+        kept = startAgent(game[0], incrementalMap=1)
+        rebuilt = startAgent(game[0])
+        for state in game:
+            states += 1
+            if kept.getEntryMap(state) != rebuilt.getEntryMap(state):
+                mismatches += 1
+    return states, mismatches
+
+
+def walkedInFront(object, facing, state):
+    """ api.inFront as it used to be: walks from Pacman, cell by cell, until a wall. """
+    if facing not in api.WallIndex.steps:
+        return False
+    walls = state.getWalls()
+    dx, dy = api.WallIndex.steps[facing]
+    x, y = state.getPacmanPosition()
+    x, y = x + dx, y + dy
+    while not walls[x][y]:
+        if (x, y) == object:
+            return True
+        x, y = x + dx, y + dy
+    return False
+
+
+def walkedAtSide(object, facing, state):
+    """ api.atSide on top of walkedInFront. """
+    if facing == Directions.NORTH or facing == Directions.SOUTH:
+        return walkedInFront(object, Directions.WEST, state) or walkedInFront(object, Directions.EAST, state)
+    if facing == Directions.WEST or facing == Directions.EAST:
+        return walkedInFront(object, Directions.NORTH, state) or walkedInFront(object, Directions.SOUTH, state)
+    return False
+
+
+def walkedVisible(objects, state):
+    """ api.visible with partial visibility, as it used to be: on top of walkedInFront and walkedAtSide. """
+    facing = state.getPacmanState().configuration.direction
+    if facing != Directions.STOP:
+        front = api.distanceLimited([o for o in objects if walkedInFront(o, facing, state)], state,
+                                    api.visibilityLimit)
+        side = api.distanceLimited([o for o in objects if walkedAtSide(o, facing, state)], state, api.sideLimit)
+        return front + side
+    around = [o for o in objects for d in api.WallIndex.directions if walkedInFront(o, d, state)]
+    return api.distanceLimited(around, state, api.visibilityLimit)
+
+
+def checkVisibility(games):
+    """ Compares, on every state, what api.visible, api.inFront and api.atSide find among the food, the
+        capsules and the ghosts with a walk along the corridors.
+
+    Args:
+        games ([[GameState]]): the states, game by game.
+
+    Returns:
+        ((int, int)): the states looked at and the ones where something differs.
+    """
+    states = 0
+    mismatches = 0
+    partialVisibility = api.partialVisibility
+    api.partialVisibility = True
+    try:
+        for game in games:
+            for state in game:
+                objects = state.getFood().asList() + state.getCapsules() + \
+                          [tuple(ghost) for ghost in state.getGhostPositions()]
+                same = api.visible(objects, state) == walkedVisible(objects, state)
+                for o in objects:
+                    for d in api.WallIndex.directions + [Directions.STOP]:
+                        same = same and bool(api.inFront(o, d, state)) == walkedInFront(o, d, state) and \
+                               api.atSide(o, d, state) == walkedAtSide(o, d, state)
+                states += 1
+                if not same:
+                    mismatches += 1
+    finally:
+        api.partialVisibility = partialVisibility
+    return states, mismatches
+
+
+def checkFoodTracker(games, rng):
+    """ Compares, on every state, the food and capsules of two api.FoodTrackers with a scan of the grid. One
+        tracker is given every state, the other only about a third of them, and checks the food count of
+        the grid on every update to notice the states it missed.
+
+    Args:
+        games ([[GameState]]): the states, game by game.
+        rng (random.Random): picks the states the second tracker is given.
+
+    Returns:
+        ((int, int)): the states given to a tracker and the ones where it was wrong.
+    """
+    states = 0
+    mismatches = 0
+    for game in games:
+        everyState = api.FoodTracker(game[0])
+        someStates = api.FoodTracker(game[0], check=True)
+        for state in game:
+            for tracker in [everyState] + ([someStates] if rng.random() < 0.3 else []):
+                before = set(tracker.food)
+                foodEaten, foodAdded, capsulesEaten = tracker.update(state)
+                states += 1
+                if tracker.food != set(state.getFood().asList()) or \
+                   tracker.capsules != set(state.getCapsules()) or set(foodEaten) != before - tracker.food:
+                    mismatches += 1
+    return states, mismatches
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    parser = OptionParser("python mdpChecks.py <options>")
+    parser.add_option('-c', '--checks', dest='checks', help='comma separated checks to run [Default: %default]',
+                      default='engines,map,visibility,food')
+    parser.add_option('-l', '--layouts', dest='layouts', help='comma separated layouts [Default: %default]',
+                      default='smallGrid,mediumClassic,originalClassic,trickyClassic')
+    parser.add_option('-e', '--engines', dest='engines', help='engines to compare with valueIteration, separated by ";" [Default: %default]',
+                      default='numpy;sparse;buffered;parallel')
+    parser.add_option('-m', '--moves', dest='moves', type='int', help='states to check on each layout [Default: %default]',
+                      default=200)
+    parser.add_option('-s', '--seed', dest='seed', type='int', help='random seed [Default: %default]', default=0)
+    options, otherjunk = parser.parse_args(sys.argv[1:])
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+
+    checks = options.checks.split(',')
+    for check in checks:
+        if check not in ['engines', 'map', 'visibility', 'food']:
+            raise Exception("There is no check called " + check)
+    engines = options.engines.split(';')
+    rng = random.Random(options.seed)
+    failed = False
+    print "%-18s %-28s %8s %11s %10s" % ("Layout", "Check", "States", "Mismatches", "Max diff")
+    for layoutName in options.layouts.split(','):
+        games = randomGames(layoutName, options.moves, rng)
+        rows = []
+        if 'engines' in checks:
+            results = checkEngines(games, engines)
+            rows += [(engine,) + tuple(results[engine]) for engine in engines]
+        if 'map' in checks:
+            rows.append(("incrementalMap",) + checkIncrementalMap(games) + (None,))
+        if 'visibility' in checks:
+            rows.append(("visibility",) + checkVisibility(games) + (None,))
+        if 'food' in checks:
+            rows.append(("FoodTracker",) + checkFoodTracker(games, rng) + (None,))
+        for name, states, mismatches, difference in rows:
+            failed = failed or mismatches > 0
+            print "%-18s %-28s %8d %11d" % (layoutName, name, states, mismatches) + \
+                  (" %10.2e" % difference if difference is not None else "")
+    if failed:
+        sys.exit(1)
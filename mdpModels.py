@@ -0,0 +1,479 @@
+# mdpModels.py
+#
+# Models of Pacman's world that MDPAgent (mdpAgents.py) and the engines in
+# mdpSolvers.py build once and then reuse move after move.
+#
+# As required by the licensing agreement for the PacMan AI we have:
+#
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+from array import array
+from game import Directions
+
+# Order in which MDPAgent considers actions, and for each move the
+# perpendicular moves it may slip into (the first legal one is used, as
+# in MDPAgent.getActionWithHighestUtility).
+ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+STEPS = {Directions.NORTH: (0, 1), Directions.SOUTH: (0, -1),
+         Directions.EAST: (1, 0), Directions.WEST: (-1, 0), Directions.STOP: (0, 0)}
+SLIPS = {Directions.NORTH: (Directions.EAST, Directions.WEST),
+         Directions.SOUTH: (Directions.EAST, Directions.WEST),
+         Directions.EAST: (Directions.NORTH, Directions.SOUTH),
+         Directions.WEST: (Directions.NORTH, Directions.SOUTH)}
+
+# Transition models already built, keyed by the text of the walls of a layout.
+transitionModelCache = {}
+
+
+def wallText(world):
+    """ Renders the walls of a world as text, one line per column, so that it can be used as a key.
+
+    Args:
+        world ([[float/None]]): 2D-Matrix indexed by [x][y] where walls are set to None.
+
+    Returns:
+        (str): '%' for every wall and ' ' for every other cell.
+    """
+    return '\n'.join([''.join(['%' if cell is None else ' ' for cell in row]) for row in world])
+
+
+def getTransitionModel(world):
+    """ Returns the transition model of a world, building it only the first time a layout is seen.
+
+    Args:
+        world ([[float/None]]): 2D-Matrix indexed by [x][y] where walls are set to None.
+
+    Returns:
+        (TransitionModel): the (possibly shared) transition model for these walls.
+    """
+    key = wallText(world)
+    if key not in transitionModelCache:
+        transitionModelCache[key] = TransitionModel(world)
+    return transitionModelCache[key]
+
+
+def getCorridorGraph(model):
+    """ Returns the corridor graph of a transition model, building it only the first time it is needed.
+
+    Args:
+        model (TransitionModel): transition model of a layout.
+
+    Returns:
+        (CorridorGraph): the corridor graph, shared by everyone using this model.
+    """
+    if model.corridorGraph is None:
+        model.corridorGraph = CorridorGraph(model)
+    return model.corridorGraph
+
+
+def getRegionGraph(model):
+    """ Returns the region graph of a transition model, building it only the first time it is needed.
+
+    Args:
+        model (TransitionModel): transition model of a layout.
+
+    Returns:
+        (RegionGraph): the region graph, shared by everyone using this model.
+    """
+    if model.regionGraph is None:
+        model.regionGraph = RegionGraph(model)
+    return model.regionGraph
+
+
+def getDistanceTable(model):
+    """ Returns the maze distance between every two cells of a transition model, working them out only the
+        first time they are needed.
+
+    Args:
+        model (TransitionModel): transition model of a layout.
+
+    Returns:
+        ([array('i')]): distances[a][b] is the number of moves from cell a to cell b, or -1 if b cannot be
+                        reached from a. Shared by everyone using this model.
+    """
+    if model.distances is None:
+        neighbours = [model.neighbours(c) for c in range(len(model.cells))]
+        model.distances = []
+        for source in range(len(model.cells)):
+            # Breadth first search from source.
+            distances = array('i', [-1]) * len(model.cells)
+            distances[source] = 0
+            frontier = [source]
+            while frontier:
+                following = []
+                for c in frontier:
+                    for n in neighbours[c]:
+                        if distances[n] < 0:
+                            distances[n] = distances[c] + 1
+                            following.append(n)
+                frontier = following
+            model.distances.append(distances)
+    return model.distances
+
+
+class TransitionModel:
+    """ Sparse description of the motion model over the open cells of a layout.
+
+        Walls never change in a game, so the legal moves of every cell and the 0.8/0.1/0.1 slip outcomes
+        of every move can be worked out once. They are stored in CSR style:
+
+        - cells[c] is the (x, y) coordinate of open cell c, and index[x][y] is c (-1 for walls);
+        - the moves of cell c are rows actionStart[c] to actionStart[c+1]-1, and actions[r] is the move of row r;
+        - the outcomes of row r are successors[k] (a cell) with probabilities[k], for k in
+          outcomeStart[r] to outcomeStart[r+1]-1;
+        - the cells that can end up in cell c are predecessors[k], for k in predecessorStart[c] to
+          predecessorStart[c+1]-1.
+
+        Moves follow the order and the legality rules of MDPAgent.getPossibleActions, and the outcomes are
+        listed as intended move, slip, stay, so that summing them in order gives exactly the numbers of
+        MDPAgent.getActionWithHighestUtility.
+    """
+
+    def __init__(self, world):
+        """
+        Args:
+            world ([[float/None]]): 2D-Matrix indexed by [x][y] where walls are set to None.
+        """
+        self.width = len(world)
+        self.height = len(world[0])
+        self.cells = []
+        self.index = [[-1] * self.height for i in range(self.width)]
+        # Same cells valueIteration visits: non-walls, except the last row and column.
+        for i in range(self.width - 1):
+            for j in range(self.height - 1):
+                if world[i][j] is not None:
+                    self.index[i][j] = len(self.cells)
+                    self.cells.append((i, j))
+
+        self.actions = []
+        self.actionStart = array('i', [0])
+        self.outcomeStart = array('i', [0])
+        self.successors = array('i')
+        self.probabilities = array('d')
+        for c, (x, y) in enumerate(self.cells):
+            legal = self.legalActions(world, x, y)
+            for action in legal:
+                self.actions.append(action)
+                for successor, probability in self.outcomes(x, y, action, legal):
+                    self.successors.append(self.index[successor[0]][successor[1]])
+                    self.probabilities.append(probability)
+                self.outcomeStart.append(len(self.successors))
+            self.actionStart.append(len(self.actions))
+
+        # The reverse of successors, for solvers that propagate changes backwards.
+        dependants = [set() for c in self.cells]
+        for c in range(len(self.cells)):
+            for k in range(self.outcomeStart[self.actionStart[c]], self.outcomeStart[self.actionStart[c + 1]]):
+                dependants[self.successors[k]].add(c)
+        self.predecessorStart = array('i', [0])
+        self.predecessors = array('i')
+        for c in range(len(self.cells)):
+            self.predecessors.extend(sorted(dependants[c]))
+            self.predecessorStart.append(len(self.predecessors))
+
+        # Built on demand by getCorridorGraph, getRegionGraph and getDistanceTable, and the cells of each
+        # sweep order by mdpSolvers.sweepCells.
+        self.corridorGraph = None
+        self.regionGraph = None
+        self.distances = None
+        self.sweepCells = {}
+
+    def legalActions(self, world, x, y):
+        """ Same as MDPAgent.getPossibleActions.
+
+        Returns:
+            ([Directions]): legal moves from (x, y), in the order of ACTIONS.
+        """
+        legal = []
+        if y + 1 < self.height - 1 and world[x][y + 1] is not None:
+            legal.append(Directions.NORTH)
+        if y - 1 >= 0 and world[x][y - 1] is not None:
+            legal.append(Directions.SOUTH)
+        if x + 1 < self.width - 1 and world[x + 1][y] is not None:
+            legal.append(Directions.EAST)
+        if x - 1 >= 0 and world[x - 1][y] is not None:
+            legal.append(Directions.WEST)
+        legal.append(Directions.STOP)
+        return legal
+
+    def outcomes(self, x, y, action, legal):
+        """ Lists where a move can take Pacman, as in MDPAgent.getActionWithHighestUtility.
+
+        Returns:
+            ([((int, int), float)]): (cell, probability) pairs: intended cell, slip cell and staying still.
+        """
+        if action == Directions.STOP:
+            return [((x, y), 1.0)]
+        dx, dy = STEPS[action]
+        intended = ((x + dx, y + dy), 0.8)
+        for slip in SLIPS[action]:
+            if slip in legal:
+                sx, sy = STEPS[slip]
+                return [intended, ((x + sx, y + sy), 0.1), ((x, y), 0.1)]
+        return [intended, ((x, y), 0.2)]
+
+    def neighbours(self, c):
+        """ Lists the cells one legal move away from cell c.
+
+        Args:
+            c (int): the cell.
+
+        Returns:
+            ([int]): the cells Pacman ends up in by moving North, South, East or West without slipping.
+        """
+        return [self.successors[self.outcomeStart[r]] for r in range(self.actionStart[c], self.actionStart[c + 1])
+                if self.actions[r] != Directions.STOP]
+
+    def flatten(self, matrix):
+        """ Reads a 2D-Matrix indexed by [x][y] into a list indexed by cell.
+
+        Args:
+            matrix ([[float/None]]): e.g. an entryMap.
+
+        Returns:
+            ([float]): matrix[x][y] for every cell (x, y) in cells.
+        """
+        return [matrix[x][y] for (x, y) in self.cells]
+
+    def unflatten(self, values):
+        """ Turns a list indexed by cell back into a 2D-Matrix indexed by [x][y], with None for walls.
+
+        Args:
+            values ([float]): one value per cell.
+
+        Returns:
+            ([[float/None]]): the 2D-Matrix.
+        """
+        matrix = [[None] * self.height for i in range(self.width)]
+        for c, (x, y) in enumerate(self.cells):
+            matrix[x][y] = values[c]
+        return matrix
+
+
+class CorridorGraph:
+    """ The open cells of a layout seen as junctions connected by corridors.
+
+        Most open cells have exactly two neighbours: they are part of a corridor, where Pacman can only go
+        on or back. All the other cells (junctions and dead ends) are nodes, and each corridor is the chain
+        of cells between two nodes:
+
+        - nodes is the list of node cells, and isNode[c] tells whether cell c is one;
+        - corridors[k] is (endA, cells, endB): the node at each end and the corridor cells from endA to endB
+          (both ends can be the same node, for loops);
+        - corridorOf[c] is (k, i) for the i-th cell of corridor k, or None for nodes.
+
+        A loop of corridor cells without any junction gets one of its cells promoted to node.
+    """
+
+    def __init__(self, model):
+        """
+        Args:
+            model (TransitionModel): transition model of the layout.
+        """
+        neighbours = [model.neighbours(c) for c in range(len(model.cells))]
+        self.isNode = [len(n) != 2 for n in neighbours]
+        self.corridors = []
+        self.corridorOf = [None] * len(model.cells)
+
+        start = 0
+        while True:
+            for node in range(len(model.cells)):
+                if self.isNode[node]:
+                    for first in neighbours[node]:
+                        if not self.isNode[first] and self.corridorOf[first] is None:
+                            self.addCorridor(neighbours, node, first)
+            # What is left are loops without junctions: promote a cell of each.
+            while start < len(model.cells) and (self.isNode[start] or self.corridorOf[start] is not None):
+                start += 1
+            if start == len(model.cells):
+                break
+            self.isNode[start] = True
+
+        self.nodes = [c for c in range(len(model.cells)) if self.isNode[c]]
+
+    def addCorridor(self, neighbours, endA, first):
+        """ Walks along a corridor from node endA through cell first until the next node.
+        """
+        k = len(self.corridors)
+        cells = []
+        previous, current = endA, first
+        while not self.isNode[current]:
+            self.corridorOf[current] = (k, len(cells))
+            cells.append(current)
+            following = [n for n in neighbours[current] if n != previous]
+            previous, current = current, following[0]
+        self.corridors.append((endA, cells, current))
+
+
+class RegionGraph:
+    """ The open cells of a layout split into regions that only touch each other at articulation cells.
+
+        Every move can be undone, so the whole maze is a single strongly connected component. What does split
+        it are articulation cells, the cells whose removal disconnects the maze (the entrance of a dead end,
+        a corridor between two parts of the board): the regions are the biconnected components of the maze.
+
+        - regions[g] lists the cells of region g. Regions are in the order a depth-first search finishes
+          them, so the regions hanging off a part of the maze (dead ends first) come before it;
+        - regionsOf[c] lists the regions cell c belongs to: more than one exactly for articulation cells.
+    """
+
+    def __init__(self, model):
+        """
+        Args:
+            model (TransitionModel): transition model of the layout.
+        """
+        neighbours = [model.neighbours(c) for c in range(len(model.cells))]
+        self.regions = []
+        depth = [-1] * len(model.cells)
+        low = [0] * len(model.cells)
+        for root in range(len(model.cells)):
+            if depth[root] != -1:
+                continue
+            depth[root] = 0
+            if len(neighbours[root]) == 0:
+                self.regions.append([root])
+                continue
+            # Tarjan's algorithm, with explicit stacks of the cells being visited and of the edges seen.
+            edges = []
+            stack = [(root, -1, iter(neighbours[root]))]
+            while stack:
+                c, parent, following = stack[-1]
+                advanced = False
+                for n in following:
+                    if depth[n] == -1:
+                        depth[n] = low[n] = depth[c] + 1
+                        edges.append((c, n))
+                        stack.append((n, c, iter(neighbours[n])))
+                        advanced = True
+                        break
+                    elif n != parent and depth[n] < depth[c]:
+                        edges.append((c, n))
+                        low[c] = min(low[c], depth[n])
+                if advanced:
+                    continue
+                stack.pop()
+                if stack:
+                    parent = stack[-1][0]
+                    low[parent] = min(low[parent], low[c])
+                    if low[c] >= depth[parent]:
+                        region = set()
+                        while True:
+                            edge = edges.pop()
+                            region.update(edge)
+                            if edge == (parent, c):
+                                break
+                        self.regions.append(sorted(region))
+
+        self.regionsOf = [[] for c in model.cells]
+        for g, region in enumerate(self.regions):
+            for c in region:
+                self.regionsOf[c].append(g)
+
+
+class GridBuffers:
+    """ Rewards and utilities of a layout kept in preallocated arrays instead of 2D-Matrices.
+
+        There is one array('d') slot per open cell of the transition model, in the order of model.cells, so
+        walls take no room at all: model.index (-1 for walls) is the wall mask. A slot takes 8 bytes, where a
+        2D-Matrix takes a pointer and a Python float object per cell. An agent allocates its own buffers once
+        per layout and then overwrites them on every move, so neither its map nor its solves allocate anything.
+
+        - rewards holds the rewards of the move being solved. rewardMap() lets the agent keep its entryMap
+          in there and change it in place;
+        - values holds the current utilities, and scratch the other half of a Jacobi sweep (see swap).
+    """
+
+    def __init__(self, model):
+        """
+        Args:
+            model (TransitionModel): transition model of the layout.
+        """
+        self.model = model
+        self.rewards = array('d', [0.0]) * len(model.cells)
+        self.values = array('d', [0.0]) * len(model.cells)
+        self.scratch = array('d', [0.0]) * len(model.cells)
+
+    def load(self, target, matrix):
+        """ Copies a 2D-Matrix into one of the buffers, without allocating anything.
+
+        Args:
+            target (array): self.rewards, self.values or self.scratch.
+            matrix ([[float/None]]): 2D-Matrix indexed by [x][y], e.g. an entryMap.
+        """
+        for c, (x, y) in enumerate(self.model.cells):
+            target[c] = matrix[x][y]
+
+    def fill(self, target, value):
+        """ Sets every slot of one of the buffers to value.
+        """
+        for c in xrange(len(target)):
+            target[c] = value
+
+    def swap(self):
+        """ Makes scratch the current utilities, after a Jacobi sweep has written them there.
+        """
+        self.values, self.scratch = self.scratch, self.values
+
+    def view(self):
+        """
+        Returns:
+            (GridView): the current utilities, readable as values[x][y] until the buffers are used again.
+        """
+        return GridView(self.model, self.values)
+
+    def rewardMap(self):
+        """
+        Returns:
+            (GridView): the rewards, readable and writable as entryMap[x][y].
+        """
+        return GridView(self.model, self.rewards)
+
+
+class GridView:
+    """ Access to a buffer of GridBuffers as if it were a 2D-Matrix: view[x][y] is the value of cell (x, y),
+        or None for walls. Writing view[x][y] changes the buffer, and writing to a wall does nothing.
+    """
+
+    def __init__(self, model, values):
+        """
+        Args:
+            model (TransitionModel): transition model of the layout.
+            values (array): one value per cell of the model.
+        """
+        self.model = model
+        self.values = values
+
+    def __len__(self):
+        return self.model.width
+
+    def __getitem__(self, x):
+        return GridColumn(self.model.index[x], self.values)
+
+
+class GridColumn:
+    """ Column x of a GridView. """
+
+    def __init__(self, index, values):
+        self.index = index
+        self.values = values
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, y):
+        c = self.index[y]
+        return self.values[c] if c >= 0 else None
+
+    def __setitem__(self, y, value):
+        c = self.index[y]
+        if c >= 0:
+            self.values[c] = value
@@ -0,0 +1,283 @@
+# mdpParallel.py
+#
+# Value iteration for very large layouts, split over several processes.
+# The open cells are cut into strips of whole columns and a pool of
+# worker processes sweeps one strip each, reading and writing utilities
+# kept in shared memory. Registers the "parallel" solver of MDPAgent
+# (mdpAgents.py).
+#
+# Run on its own, it reports how well the sweeps scale with the number
+# of processes, on a layout tiled to make it as large as wanted:
+#
+#   python mdpParallel.py -l originalClassic -t 4 -w 4
+#
+# As required by the licensing agreement for the PacMan AI we have:
+#
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+import atexit
+import multiprocessing
+import sys
+import time
+
+import mdpSolvers
+
+# What a worker process shares with the process that started it: the transition model, the rewards and the
+# two utility buffers. Set once, when the worker starts.
+shared = None
+
+
+def startWorker(model, rewards, buffers):
+    """ Runs in every worker process of a StripSweeper when it starts. """
+    global shared
+    shared = (model, rewards, buffers)
+
+
+def sweepStrip(task):
+    """ Runs in a worker process: one Jacobi sweep over a strip of cells.
+
+        The utilities are read from one shared buffer and written to the other, so the strips of a sweep can
+        run in any order. The only utilities of other strips a strip reads are those of its halo, the columns
+        right next to it, and these are read straight from shared memory.
+
+    Args:
+        task ((int, int, int, float)): the first cell of the strip, the cell after its last one, the buffer
+                                       holding the utilities of the previous sweep (0 or 1) and the discount.
+
+    Returns:
+        (float): the largest change of a utility in the strip.
+    """
+    start, end, source, discount = task
+    model, rewards, buffers = shared
+    values = buffers[source]
+    newValues = buffers[1 - source]
+    residual = 0.0
+    for c in xrange(start, end):
+        newUtility = rewards[c] + discount * mdpSolvers.bestActionUtility(model, values, c)
+        residual = max(residual, abs(newUtility - values[c]))
+        newValues[c] = newUtility
+    return residual
+
+
+def stripBounds(model, strips):
+    """ Cuts the open cells of a layout into strips of whole columns, with about as many cells in each.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        strips (int): number of strips wanted. There are fewer if there are fewer columns.
+
+    Returns:
+        ([(int, int)]): the first cell of each strip and the cell after its last one. model.cells goes column
+                        by column, so each strip is a range of cells.
+    """
+    cells = model.cells
+    bounds = []
+    start = 0
+    for c in range(1, len(cells)):
+        if cells[c][0] != cells[c - 1][0] and c - start >= (len(cells) - start) / float(strips - len(bounds)):
+            bounds.append((start, c))
+            start = c
+    bounds.append((start, len(cells)))
+    return bounds
+
+
+class StripSweeper:
+    """ A pool of worker processes running value iteration on one layout, a strip of columns each.
+
+        The rewards and the utilities live in multiprocessing.RawArray buffers that every worker maps, so
+        after the pool has started nothing but the strip bounds and the residuals goes between processes.
+        Each sweep reads the utilities of the previous one from one buffer and writes into the other, which
+        is what lets neighbouring strips read each other's halo columns without any locking; the buffers swap
+        roles after every sweep. The utilities are exactly those of mdpSolvers.sparseValueIteration with
+        Jacobi sweeps, whatever the number of workers.
+    """
+
+    def __init__(self, model, workers):
+        """
+        Args:
+            model (mdpModels.TransitionModel): transition model of the layout.
+            workers (int): number of worker processes.
+        """
+        self.model = model
+        self.workers = workers
+        self.strips = stripBounds(model, workers)
+        self.rewards = multiprocessing.RawArray('d', len(model.cells))
+        self.buffers = [multiprocessing.RawArray('d', len(model.cells)), multiprocessing.RawArray('d', len(model.cells))]
+        self.pool = multiprocessing.Pool(workers, startWorker, (model, self.rewards, self.buffers))
+
+    def solve(self, entryMap, discount, initialValues=None, rule=None):
+        """ Value iteration with Jacobi sweeps, each sweep split over the worker processes.
+
+        Args:
+            entryMap ([[float/None]]): 2D-Matrix of rewards indexed by [x][y], with walls set to None.
+            discount (float): Discount factor.
+            initialValues ([[float/None]]): utilities to start from. Defaults to the rewards.
+            rule (mdpSolvers.StoppingRule): when to stop. Defaults to stopping when no utility changes.
+
+        Returns:
+            (mdpSolvers.Solution): its values are a 2D-Matrix holding the utility of each cell, with walls set to None.
+        """
+        model = self.model
+        self.rewards[:] = model.flatten(entryMap)
+        if initialValues is None:
+            self.buffers[0][:] = self.rewards[:]
+        else:
+            self.buffers[0][:] = [float(value) for value in model.flatten(initialValues)]
+        if rule is None:
+            rule = mdpSolvers.StoppingRule(discount)
+
+        index = model.index
+        source = 0
+        sweeps = 0
+        while True:
+            residual = max(self.pool.map(sweepStrip, [(start, end, source, discount) for (start, end) in self.strips]))
+            source = 1 - source
+            sweeps += 1
+            values = self.buffers[source]
+            if rule.done(residual, lambda x, y: values[index[x][y]]):
+                return mdpSolvers.Solution(model.unflatten(values[:]), sweeps, residual)
+
+    def close(self):
+        """ Stops the worker processes. """
+        self.pool.terminate()
+        self.pool.join()
+
+
+# The StripSweeper of each layout and number of workers, kept for the whole run so that the worker processes
+# are only started once. They are closed when the run ends.
+sweepers = {}
+
+
+def getStripSweeper(model, workers):
+    """
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        workers (int): number of worker processes.
+
+    Returns:
+        (StripSweeper): the sweeper of that layout with that many workers, started if there is none yet.
+    """
+    key = (model, workers)
+    if key not in sweepers:
+        sweepers[key] = StripSweeper(model, workers)
+    return sweepers[key]
+
+
+def closeStripSweepers():
+    """ Stops the worker processes of every kept StripSweeper. """
+    for sweeper in sweepers.values():
+        sweeper.close()
+    sweepers.clear()
+
+
+atexit.register(closeStripSweepers)
+
+
+def solveParallel(problem):
+    workers = problem.option("workers", multiprocessing.cpu_count())
+    return getStripSweeper(problem.model, workers).solve(problem.entryMap, problem.discount, problem.initialValues,
+                                                         problem.rule)
+
+
+mdpSolvers.registerSolver(mdpSolvers.Solver("parallel", solveParallel, sweeps=["jacobi"]))
+
+
+def tiledLayout(theLayout, tiles):
+    """ A layout made of tiles x tiles copies of another one, to try the solvers on very large mazes.
+        Only the first copy keeps Pacman and the ghosts. Copies are not connected to each other, which
+        makes no difference to the work of a sweep.
+
+    Args:
+        theLayout (layout.Layout): the layout to copy.
+        tiles (int): number of copies along each side.
+
+    Returns:
+        (layout.Layout): the tiled layout.
+    """
+    import layout
+    empty = dict([(char, ' ') for char in 'PG1234'])
+    plain = [''.join([empty.get(char, char) for char in row]) for row in theLayout.layoutText]
+    rows = []
+    for i in range(tiles):
+        for j, row in enumerate(theLayout.layoutText):
+            rows.append((row if i == 0 else plain[j]) + plain[j] * (tiles - 1))
+    return layout.Layout(rows)
+
+
+def scalingReport(theLayout, maxWorkers, repeats):
+    """ Solves the first move of a layout with the sparse solver and with 1 to maxWorkers worker processes,
+        and prints the time each took, the speedup over one worker and the efficiency (speedup per worker).
+
+    Args:
+        theLayout (layout.Layout): the layout.
+        maxWorkers (int): largest number of worker processes tried.
+        repeats (int): number of times each solve is timed. The fastest time is reported.
+    """
+    import mdpAgents
+    import util
+    from pacman import GameState
+    state = GameState()
+    state.initialize(theLayout, theLayout.getNumGhosts())
+    util.mutePrint()
+    try:
+        agent = mdpAgents.MDPAgent(engine="sparse")
+        agent.registerInitialState(state)
+    finally:
+        util.unmutePrint()
+    model = agent.transitionModel
+    entryMap = agent.getEntryMap(state)
+
+    def fastest(solve):
+        best = None
+        for i in range(repeats):
+            start = time.time()
+            solution = solve()
+            seconds = time.time() - start
+            best = seconds if best is None else min(best, seconds)
+        return best, solution
+
+    print "%d open cells, %d columns" % (len(model.cells), model.width)
+    seconds, solution = fastest(lambda: mdpSolvers.sparseValueIteration(model, entryMap, agent.discount))
+    print "%-10s %8s %10s %8s %8s %11s" % ("Workers", "Strips", "Time (s)", "Sweeps", "Speedup", "Efficiency")
+    print "%-10s %8s %10.3f %8d" % ("sparse", "-", seconds, solution.sweeps)
+    oneWorker = None
+    for workers in range(1, maxWorkers + 1):
+        sweeper = StripSweeper(model, workers)
+        try:
+            seconds, solution = fastest(lambda: sweeper.solve(entryMap, agent.discount))
+        finally:
+            sweeper.close()
+        if oneWorker is None:
+            oneWorker = seconds
+        speedup = oneWorker / seconds
+        print "%-10d %8d %10.3f %8d %7.2fx %10.1f%%" % (workers, len(sweeper.strips), seconds, solution.sweeps, speedup,
+                                                       100 * speedup / workers)
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    import layout
+    parser = OptionParser("python mdpParallel.py <options>")
+    parser.add_option('-l', '--layout', dest='layout', help='layout to solve [Default: %default]', default='originalClassic')
+    parser.add_option('-t', '--tiles', dest='tiles', type='int', help='copies of the layout along each side [Default: %default]',
+                      default=4)
+    parser.add_option('-w', '--workers', dest='workers', type='int', help='largest number of worker processes [Default: %default]',
+                      default=multiprocessing.cpu_count())
+    parser.add_option('-r', '--repeats', dest='repeats', type='int', help='times each solve is timed [Default: %default]', default=3)
+    options, otherjunk = parser.parse_args(sys.argv[1:])
+    if len(otherjunk) != 0:
+        raise Exception('Command line input not understood: ' + str(otherjunk))
+
+    theLayout = layout.getLayout(options.layout)
+    if theLayout is None:
+        raise Exception("The layout " + options.layout + " cannot be found")
+    scalingReport(tiledLayout(theLayout, options.tiles), options.workers, options.repeats)
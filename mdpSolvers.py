@@ -0,0 +1,1409 @@
+# mdpSolvers.py
+#
+# Alternative engines for solving the MDP that MDPAgent (mdpAgents.py)
+# builds on every move.
+#
+# Every engine here takes the same entryMap that MDPAgent.valueIteration
+# takes (a 2D-Matrix indexed as entryMap[x][y], holding the reward of
+# each cell or None for walls) and returns a Solution, whose values are a
+# matrix of utilities that can be indexed the same way.
+#
+# At the end of the file every engine is registered as a Solver under the
+# name MDPAgent picks it by (-a solver=...). A new engine only needs a
+# function solving a Problem and a call to registerSolver.
+#
+# As required by the licensing agreement for the PacMan AI we have:
+#
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+import heapq
+import mdpModels
+import time
+import util
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Orders in which value iteration can update the cells in a sweep.
+sweepOrders = ["jacobi", "gaussSeidel", "redBlack"]
+
+# Largest error allowed on the utilities by the engines that need one to stop. It has to be small next to
+# the rewards of MDPAgent: with generalCost = -0.01 and discount 0.6 all utilities lie within about 0.025
+# of each other, and a food pellet a few cells away changes them by about 1e-4. With 0.001, prioritized
+# sweeping left stale utilities of the previous move in place and Pacman stood still next to the food.
+defaultEpsilon = 1e-5
+
+
+class Solution:
+    """ What an engine returns: the utilities it found and how much work it took to find them.
+    """
+
+    def __init__(self, values, sweeps, residual=0.0, updates=None, policy=None, regionSweeps=None):
+        """
+        Args:
+            values ([[float/None]]): utilities of each cell, indexed as values[x][y].
+            sweeps (int): number of sweeps over the grid that were needed.
+            residual (float): largest change of a utility in the last sweep (the Bellman residual).
+            updates (int): number of single-cell Bellman updates. Engines that sweep the whole grid can leave it out.
+            policy ([int]): for policy iteration, the action row (in the TransitionModel) chosen in each cell.
+            regionSweeps ([int]): for regionValueIteration, the sweeps spent on each region of the RegionGraph.
+
+        Solver.solve also sets action, the greedy action at Pacman's position, and solveSeconds and
+        actionSeconds, the time spent solving and picking it. It fills in updates for the engines that
+        sweep the whole grid.
+        """
+        self.values = values
+        self.sweeps = sweeps
+        self.residual = residual
+        self.updates = updates
+        self.policy = policy
+        self.regionSweeps = regionSweeps
+        self.action = None
+        self.solveSeconds = 0.0
+        self.actionSeconds = 0.0
+
+
+class StoppingRule:
+    """ Decides when value iteration can stop.
+
+        By default it stops only when a sweep changes no utility at all. With an epsilon it stops as soon as
+        the Bellman residual drops below epsilon * (1 - discount) / discount, which guarantees that the
+        utilities are within epsilon of the exact ones, so the greedy policy is still near-optimal.
+        With stableSweeps it also stops once the greedy action at Pacman's cell has not changed for that
+        many sweeps in a row. With a deadline it stops, whatever the residual, once that time has come, and
+        remembers it in timedOut: the utilities found so far are then the best there is for this move.
+        The residual of every sweep it is asked about is kept in residuals, as is that of every sweep
+        recorded by solvers that do not stop by it.
+    """
+
+    def __init__(self, discount, epsilon=None, stableSweeps=None, position=None, legal=None, deadline=None):
+        """
+        Args:
+            discount (float): Discount factor.
+            epsilon (float): largest error allowed on the utilities, or None to iterate until nothing changes.
+            stableSweeps (int): sweeps the greedy action must stay the same for, or None to not use this test.
+            position ((int, int)): Pacman's position, needed by stableSweeps.
+            legal ([Directions]): Pacman's legal actions, needed by stableSweeps.
+            deadline (float): time (as given by time.time()) by which iterating must stop, or None for no limit.
+        """
+        self.threshold = None
+        if epsilon is not None:
+            self.threshold = epsilon * (1 - discount) / discount
+        self.stableSweeps = stableSweeps
+        self.position = position
+        self.legal = legal
+        self.lastAction = None
+        self.stableCount = 0
+        self.deadline = deadline
+        self.timedOut = False
+        self.residuals = []
+
+    def done(self, residual, valueAt):
+        """ Called after every sweep.
+
+        Args:
+            residual (float): largest change of a utility in this sweep.
+            valueAt (function): valueAt(x, y) returns the current utility of cell (x, y).
+
+        Returns:
+            (bool): True if iterating can stop.
+        """
+        self.record(residual)
+        if residual == 0:
+            return True
+        if self.threshold is not None and residual < self.threshold:
+            return True
+        if self.stableSweeps is not None and self.position is not None:
+            action = greedyAction(valueAt, self.position, self.legal)
+            if action == self.lastAction:
+                self.stableCount += 1
+            else:
+                self.lastAction = action
+                self.stableCount = 1
+            if self.stableCount >= self.stableSweeps:
+                return True
+        return self.outOfTime()
+
+    def record(self, residual):
+        """ Keeps the residual of a sweep without deciding anything, for solvers that stop on their own.
+
+        Args:
+            residual (float): largest change of a utility in this sweep.
+        """
+        self.residuals.append(residual)
+
+    def outOfTime(self):
+        """ Tells whether the deadline has passed, for engines that stop in other ways but still need to check it.
+
+        Returns:
+            (bool): True if there is a deadline and it has passed.
+        """
+        if self.deadline is not None and time.time() >= self.deadline:
+            self.timedOut = True
+        return self.timedOut
+
+
+def sweepOrder(width, height, sweep):
+    """ Lists the cells of a width x height grid in the order a sweep visits them.
+
+    Args:
+        width (int): number of columns to visit.
+        height (int): number of rows to visit.
+        sweep (str): one of sweepOrders. "redBlack" visits first the cells with an even x + y
+                     (which only have odd neighbours) and then the odd ones; the others go column by column.
+
+    Returns:
+        ([(int, int)]): the (x, y) coordinates of the cells.
+    """
+    cells = [(i, j) for i in range(width) for j in range(height)]
+    if sweep == "redBlack":
+        return [cell for cell in cells if (cell[0] + cell[1]) % 2 == 0] + \
+               [cell for cell in cells if (cell[0] + cell[1]) % 2 == 1]
+    return cells
+
+
+def sweepCells(model, sweep):
+    """ The open cells of a transition model in the order a sweep visits them, worked out once per layout.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        sweep (str): one of sweepOrders.
+
+    Returns:
+        ([int]): the cells, shared by everyone using this model.
+    """
+    if sweep not in model.sweepCells:
+        index = model.index
+        model.sweepCells[sweep] = [index[x][y] for (x, y) in sweepOrder(model.width, model.height, sweep)
+                                   if index[x][y] >= 0]
+    return model.sweepCells[sweep]
+
+
+def greedyAction(valueAt, position, legal):
+    """ Picks the legal action leading to the cell with the highest utility, as MDPAgent.getAction does.
+
+    Args:
+        valueAt (function): valueAt(x, y) returns the utility of cell (x, y).
+        position ((int, int)): Pacman's position.
+        legal ([Directions]): Pacman's legal actions.
+
+    Returns:
+        (Directions): the first legal action with the highest utility.
+    """
+    bestAction = None
+    for action in legal:
+        dx, dy = mdpModels.STEPS[action]
+        utility = valueAt(position[0] + dx, position[1] + dy)
+        if bestAction is None or utility > bestAction[1]:
+            bestAction = (action, utility)
+    return bestAction[0]
+
+
+def requireNumpy(engine):
+    """ Raises an exception explaining that the given engine needs NumPy, if NumPy is not installed.
+
+    Args:
+        engine (str): Name of the engine that has been requested.
+    """
+    if np is None:
+        raise Exception("The " + engine + " engine requires NumPy, which is not installed")
+
+
+def gridArrays(entryMap):
+    """ Converts an entryMap into the arrays used by the vectorized engines.
+
+    Args:
+        entryMap ([[float/None]]): 2D-Matrix of rewards indexed by [x][y], with walls set to None.
+
+    Returns:
+        rewards (numpy.ndarray): W x H float array of rewards, with walls set to 0.
+        isOpen (numpy.ndarray): W x H boolean array, True for every non-wall cell.
+    """
+    isOpen = np.array([[value is not None for value in row] for row in entryMap], dtype=bool)
+    rewards = np.array([[value if value is not None else 0.0 for value in row] for row in entryMap], dtype=float)
+    return rewards, isOpen
+
+
+def legalMasks(isOpen):
+    """ Works out, for every cell at once, which moves MDPAgent.getPossibleActions would allow.
+
+    Args:
+        isOpen (numpy.ndarray): W x H boolean array, True for every non-wall cell.
+
+    Returns:
+        active (numpy.ndarray): cells that valueIteration updates (open and not on the last row/column).
+        north, south, east, west (numpy.ndarray): W x H boolean arrays, True where the move is legal.
+    """
+    width, height = isOpen.shape
+    north = np.zeros(isOpen.shape, dtype=bool)
+    south = np.zeros(isOpen.shape, dtype=bool)
+    east = np.zeros(isOpen.shape, dtype=bool)
+    west = np.zeros(isOpen.shape, dtype=bool)
+    # Same bounds as getPossibleActions: the last row and column are never stepped into.
+    north[:, :height - 2] = isOpen[:, 1:height - 1]
+    south[:, 1:] = isOpen[:, :-1]
+    east[:width - 2, :] = isOpen[1:width - 1, :]
+    west[1:, :] = isOpen[:-1, :]
+
+    active = isOpen.copy()
+    active[width - 1, :] = False
+    active[:, height - 1] = False
+    return active, north, south, east, west
+
+
+def shifted(values, dx, dy):
+    """ Returns an array whose element [x][y] is values[x + dx][y + dy] (0 outside the grid).
+
+    Args:
+        values (numpy.ndarray): W x H array, or a stack of them (N x W x H), which are all shifted.
+        dx (int): -1, 0 or 1.
+        dy (int): -1, 0 or 1.
+
+    Returns:
+        (numpy.ndarray): the shifted array, of the same shape.
+    """
+    result = np.zeros(values.shape)
+    width, height = values.shape[-2:]
+    result[..., max(0, -dx):width - max(0, dx), max(0, -dy):height - max(0, dy)] = \
+        values[..., max(0, dx):width - max(0, -dx), max(0, dy):height - max(0, -dy)]
+    return result
+
+
+def numpyBellmanBackup(rewards, values, masks, discount):
+    """ Applies one Jacobi sweep of the Bellman update to the whole grid at once.
+
+        The motion model is the same one worked out in MDPAgent.getActionWithHighestUtility:
+        the intended move gets 0.8, the first legal perpendicular move gets 0.1 and the rest
+        stays in the current cell. Actions are compared in the same order (North, South, East, West,
+        Stop) and with the same tie rule, so the result is bit-for-bit the one of the loop.
+
+        Stacks of N grids on the same layout (N x W x H arrays) are updated all at once the same way.
+
+    Args:
+        rewards (numpy.ndarray): W x H float array of rewards.
+        values (numpy.ndarray): W x H float array of utilities from the previous sweep.
+        masks ((numpy.ndarray, ...)): the output of legalMasks.
+        discount (float/numpy.ndarray): Discount factor, or for stacks an N x 1 x 1 array of them.
+
+    Returns:
+        (numpy.ndarray): W x H float array with the new utilities.
+    """
+    active, north, south, east, west = masks
+    uNorth = shifted(values, 0, 1)
+    uSouth = shifted(values, 0, -1)
+    uEast = shifted(values, 1, 0)
+    uWest = shifted(values, -1, 0)
+
+    def slip(intended, first, firstLegal, second, secondLegal):
+        return np.where(firstLegal, 0.8 * intended + 0.1 * first + 0.1 * values,
+                        np.where(secondLegal, 0.8 * intended + 0.1 * second + 0.1 * values,
+                                 0.8 * intended + 0.2 * values))
+
+    actionUtilities = [
+        (north, slip(uNorth, uEast, east, uWest, west)),
+        (south, slip(uSouth, uEast, east, uWest, west)),
+        (east, slip(uEast, uNorth, north, uSouth, south)),
+        (west, slip(uWest, uNorth, north, uSouth, south)),
+        (active, values),
+    ]
+
+    bestActionUtility = np.zeros(values.shape)
+    for legal, actionUtility in actionUtilities:
+        better = legal & ((actionUtility > bestActionUtility) | (bestActionUtility == 0))
+        bestActionUtility = np.where(better, actionUtility, bestActionUtility)
+
+    return np.where(active, rewards + discount * bestActionUtility, values)
+
+
+def numpyValueIteration(entryMap, discount, initialValues=None, rule=None, sweep="jacobi"):
+    """ Vectorized version of MDPAgent.valueIteration.
+        The rewards, wall mask and utilities are kept as NumPy arrays and each sweep updates
+        the whole grid with shifted-array operations instead of visiting cells one by one.
+
+    Args:
+        entryMap ([[float/None]]): 2D-Matrix of rewards indexed by [x][y], with walls set to None.
+        discount (float): Discount factor.
+        initialValues ([[float/None]]): utilities to start from (e.g. last move's). Defaults to the rewards.
+        rule (StoppingRule): when to stop. Defaults to stopping when no utility changes.
+        sweep (str): "jacobi", or "redBlack" to update the even cells in place before the odd ones.
+
+    Returns:
+        (Solution): its values are a W x H numpy.ndarray, indexed as values[x][y]. Walls hold 0 and
+                    should not be read.
+    """
+    requireNumpy("numpy")
+    rewards, isOpen = gridArrays(entryMap)
+    masks = legalMasks(isOpen)
+
+    #Initialize the values to be a copy of the rewards, as valueIteration does, unless told otherwise.
+    if initialValues is None:
+        values = rewards.copy()
+    elif isinstance(initialValues, np.ndarray):
+        values = np.where(isOpen, initialValues, 0.0)
+    else:
+        values = gridArrays(initialValues)[0]
+
+    if rule is None:
+        rule = StoppingRule(discount)
+
+    if sweep == "redBlack":
+        xs, ys = np.indices(isOpen.shape)
+        colours = [(xs + ys) % 2 == 0, (xs + ys) % 2 == 1]
+    elif sweep != "jacobi":
+        raise Exception("The numpy engine cannot run " + str(sweep) + " sweeps")
+
+    #Iterate till the stopping rule is met
+    sweeps = 0
+    while True:
+        if sweep == "jacobi":
+            newValues = numpyBellmanBackup(rewards, values, masks, discount)
+        else:
+            # Red cells only depend on black ones (and themselves), so each half can be updated at once.
+            newValues = values
+            for colour in colours:
+                newValues = np.where(colour, numpyBellmanBackup(rewards, newValues, masks, discount), newValues)
+        sweeps += 1
+        residual = float(np.max(np.abs(newValues - values)))
+        if rule.done(residual, lambda x, y: newValues[x][y]):
+            return Solution(newValues, sweeps, residual)
+        values = newValues
+
+
+def batchValueIteration(entryMaps, discount, position, legal, epsilon=None):
+    """ Solves many reward maps of the same layout together, e.g. to tune the rewards of MDPAgent offline.
+
+        The N reward maps are stacked in an N x W x H array and every sweep of numpyBellmanBackup updates all
+        of them at once, sharing the legal-move masks of the layout. Each map stops changing once it has
+        converged on its own, so its utilities are exactly the ones numpyValueIteration gives for it alone.
+
+    Args:
+        entryMaps ([[[float/None]]]/numpy.ndarray): N entryMaps (2D-Matrices of rewards indexed by [x][y] with
+                                                   walls set to None), or an N x W x H array with walls set
+                                                   to NaN. All of them must have the same walls.
+        discount (float/[float]): Discount factor, or one for every map.
+        position ((int, int)): Pacman's position, where the greedy actions are taken.
+        legal ([Directions]): Pacman's legal actions there.
+        epsilon (float): largest error allowed on the utilities, as in StoppingRule, or None to iterate until
+                         nothing changes.
+
+    Returns:
+        solution (Solution): its values are an N x W x H numpy.ndarray (walls hold 0 and should not be read),
+                             its sweeps those of the slowest map and its residual the largest last
+                             residual of a map.
+        actions ([Directions]): the greedy action at position for each map.
+    """
+    requireNumpy("batch")
+    if isinstance(entryMaps, np.ndarray):
+        isOpen = ~np.isnan(entryMaps)
+        rewards = np.where(isOpen, entryMaps, 0.0)
+    else:
+        grids = [gridArrays(entryMap) for entryMap in entryMaps]
+        rewards = np.array([grid[0] for grid in grids])
+        isOpen = np.array([grid[1] for grid in grids])
+    if not (isOpen == isOpen[0]).all():
+        raise Exception("All the reward maps of a batch must have the same walls")
+    masks = legalMasks(isOpen[0])
+
+    discounts = np.zeros(len(rewards)) + discount
+    thresholds = np.zeros(len(rewards))
+    if epsilon is not None:
+        thresholds = epsilon * (1 - discounts) / discounts
+    discounts = discounts.reshape(-1, 1, 1)
+
+    values = rewards.copy()
+    running = np.ones(len(rewards), dtype=bool)
+    lastResiduals = np.zeros(len(rewards))
+    sweeps = 0
+    while running.any():
+        newValues = numpyBellmanBackup(rewards, values, masks, discounts)
+        sweeps += 1
+        residuals = np.abs(newValues - values).reshape(len(values), -1).max(axis=1)
+        values = np.where(running.reshape(-1, 1, 1), newValues, values)
+        lastResiduals = np.where(running, residuals, lastResiduals)
+        running &= ~((residuals == 0) | (residuals < thresholds))
+
+    actions = [greedyAction(lambda x, y: grid[x][y], position, legal) for grid in values]
+    return Solution(values, sweeps, float(lastResiduals.max())), actions
+
+
+def sparseBellmanBackup(model, rewards, values, discount, cells=None, newValues=None):
+    """ Applies one sweep of the Bellman update using a precompiled TransitionModel.
+        Each action utility is a dot product between the outcome probabilities of a move and the
+        utilities of its successor cells; actions are compared as in MDPAgent.getActionWithHighestUtility.
+
+        By default this is a Jacobi sweep into a new list. Passing newValues=values updates the
+        utilities in place (Gauss-Seidel), in the order given by cells.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        rewards ([float]): reward of each cell, indexed as model.cells.
+        values ([float]): utility of each cell from the previous sweep.
+        discount (float): Discount factor.
+        cells ([int]): the cells to update, in order. Defaults to all of them.
+        newValues ([float]): where to write the new utilities. Defaults to a new list.
+
+    Returns:
+        newValues ([float]): the new utility of each cell.
+        residual (float): the largest change of a utility.
+    """
+    if cells is None:
+        cells = xrange(len(values))
+    if newValues is None:
+        newValues = values[:]
+    residual = 0.0
+    for c in cells:
+        newUtility = rewards[c] + discount * bestActionUtility(model, values, c)
+        residual = max(residual, abs(newUtility - values[c]))
+        newValues[c] = newUtility
+    return newValues, residual
+
+
+def bestActionUtility(model, values, c):
+    """ Returns the highest sum(P(s'|s,a) * U(s')) among the actions of cell c, as
+        MDPAgent.getActionWithHighestUtility does, using a precompiled TransitionModel.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        values ([float]): utility of each cell.
+        c (int): the cell.
+
+    Returns:
+        (float): the utility of the best action.
+    """
+    outcomeStart = model.outcomeStart
+    successors = model.successors
+    probabilities = model.probabilities
+    best = 0
+    for r in xrange(model.actionStart[c], model.actionStart[c + 1]):
+        actionUtility = 0.0
+        for k in xrange(outcomeStart[r], outcomeStart[r + 1]):
+            actionUtility += probabilities[k] * values[successors[k]]
+        if actionUtility > best or best == 0:
+            best = actionUtility
+    return best
+
+
+def sparseValueIteration(model, entryMap, discount, initialValues=None, rule=None, sweep="jacobi"):
+    """ Value iteration over a precompiled TransitionModel instead of the 2D-Matrix.
+        It gives exactly the same utilities as MDPAgent.valueIteration, without working out
+        legal moves and slip outcomes again on every sweep.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        entryMap ([[float/None]]): 2D-Matrix of rewards indexed by [x][y], with walls set to None.
+        discount (float): Discount factor.
+        initialValues ([[float/None]]): utilities to start from (e.g. last move's). Defaults to the rewards.
+        rule (StoppingRule): when to stop. Defaults to stopping when no utility changes.
+        sweep (str): one of sweepOrders.
+
+    Returns:
+        (Solution): its values are a 2D-Matrix holding the utility of each cell, with walls set to None.
+    """
+    rewards = model.flatten(entryMap)
+    if initialValues is None:
+        values = rewards[:]
+    else:
+        values = [float(value) for value in model.flatten(initialValues)]
+    if rule is None:
+        rule = StoppingRule(discount)
+
+    index = model.index
+    cells = sweepCells(model, sweep)
+    sweeps = 0
+    while True:
+        if sweep == "jacobi":
+            values, residual = sparseBellmanBackup(model, rewards, values, discount, cells)
+        else:
+            values, residual = sparseBellmanBackup(model, rewards, values, discount, cells, values)
+        sweeps += 1
+        if rule.done(residual, lambda x, y: values[index[x][y]]):
+            return Solution(model.unflatten(values), sweeps, residual)
+
+
+def bufferedValueIteration(model, buffers, entryMap, discount, initialValues=None, rule=None, sweep="jacobi"):
+    """ sparseValueIteration working in the preallocated arrays of a mdpModels.GridBuffers.
+
+        Jacobi sweeps write into the scratch buffer and then swap it with the current one, instead of
+        copying the utilities on every sweep, and in-place orders write straight into the current one.
+        The utilities are exactly those of sparseValueIteration.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        buffers (mdpModels.GridBuffers): the buffers of the same layout.
+        entryMap ([[float/None]]/mdpModels.GridView): 2D-Matrix of rewards indexed by [x][y], with walls set
+                                                      to None. The rewardMap of buffers costs no copying.
+        discount (float): Discount factor.
+        initialValues ([[float/None]]/mdpModels.GridView): utilities to start from. Defaults to the rewards.
+                                                           The view of the last solve costs no copying.
+        rule (StoppingRule): when to stop. Defaults to stopping when no utility changes.
+        sweep (str): one of sweepOrders.
+
+    Returns:
+        (Solution): its values are a mdpModels.GridView of the buffers, which the next solve overwrites.
+    """
+    if not (isinstance(entryMap, mdpModels.GridView) and entryMap.values is buffers.rewards):
+        buffers.load(buffers.rewards, entryMap)
+    if initialValues is None:
+        buffers.values[:] = buffers.rewards
+    elif not (isinstance(initialValues, mdpModels.GridView) and initialValues.values is buffers.values):
+        buffers.load(buffers.values, initialValues)
+    if rule is None:
+        rule = StoppingRule(discount)
+
+    index = model.index
+    cells = sweepCells(model, sweep)
+    sweeps = 0
+    while True:
+        if sweep == "jacobi":
+            residual = sparseBellmanBackup(model, buffers.rewards, buffers.values, discount, cells, buffers.scratch)[1]
+            buffers.swap()
+        else:
+            residual = sparseBellmanBackup(model, buffers.rewards, buffers.values, discount, cells, buffers.values)[1]
+        sweeps += 1
+        values = buffers.values
+        if rule.done(residual, lambda x, y: values[index[x][y]]):
+            return Solution(buffers.view(), sweeps, residual)
+
+
+class CellQueue(util.PriorityQueue):
+    """ A util.PriorityQueue of cells where lowering the priority of a queued cell is O(log n):
+        the cell is pushed again and the stale entry is skipped when it comes out.
+    """
+
+    def __init__(self):
+        util.PriorityQueue.__init__(self)
+        self.priorities = {}
+
+    def update(self, item, priority):
+        if item in self.priorities and self.priorities[item] <= priority:
+            return
+        self.priorities[item] = priority
+        self.push(item, priority)
+
+    def pop(self):
+        while True:
+            (priority, _, item) = heapq.heappop(self.heap)
+            if self.priorities.get(item) == priority:
+                del self.priorities[item]
+                return item
+
+    def isEmpty(self):
+        return len(self.priorities) == 0
+
+
+def prioritizedSweeping(model, entryMap, discount, initialValues=None, previousEntryMap=None, epsilon=defaultEpsilon,
+                        rule=None, changedCells=None):
+    """ Updates the utilities of the previous move only where rewards have changed.
+
+        Cells whose reward differs from previousEntryMap are queued first, ordered by their Bellman error
+        (how much a Bellman update would change them). The cell with the largest error is updated, and the
+        cells that can move into it (its predecessors in the TransitionModel) are queued again if their
+        own error is now at least epsilon * (1 - discount). It stops when no queued cell is left, so the
+        work done depends on how much changed since the previous move rather than on the size of the board.
+        Once every Bellman error is below that threshold, every utility is within epsilon of the exact one.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        entryMap ([[float/None]]): 2D-Matrix of rewards indexed by [x][y], with walls set to None.
+        discount (float): Discount factor.
+        initialValues ([[float/None]]): the converged utilities of the previous move. Without them every cell
+                                       starts from its reward and is queued.
+        previousEntryMap ([[float/None]]): the rewards initialValues were computed for. Without them (e.g. when
+                                           initialValues did not converge) every cell is queued.
+        epsilon (float): largest error allowed on the utilities.
+        rule (StoppingRule): only its deadline is used, checked every len(cells) updates. The residual of each
+                             len(cells) updates is recorded in it as that of a sweep.
+        changedCells ([int]): the cells whose reward differs from previousEntryMap, when the caller already
+                              knows them, so that the two maps need not be compared.
+
+    Returns:
+        (Solution): its values are a 2D-Matrix holding the utility of each cell, with walls set to None.
+                    Its updates are the single-cell updates done, and sweeps how many full sweeps they add up to.
+    """
+    rewards = model.flatten(entryMap)
+    if initialValues is None:
+        values = rewards[:]
+    else:
+        values = [float(value) for value in model.flatten(initialValues)]
+    if initialValues is None or previousEntryMap is None:
+        changed = range(len(values))
+    elif changedCells is not None:
+        changed = changedCells
+    else:
+        previousRewards = model.flatten(previousEntryMap)
+        changed = [c for c in range(len(values)) if rewards[c] != previousRewards[c]]
+
+    threshold = epsilon * (1 - discount)
+    queue = CellQueue()
+
+    def bellmanError(c):
+        return abs(rewards[c] + discount * bestActionUtility(model, values, c) - values[c])
+
+    for c in changed:
+        error = bellmanError(c)
+        if error >= threshold:
+            queue.update(c, -error)
+
+    updates = 0
+    residual = 0.0
+    sweepResidual = 0.0
+    recorded = 0
+    while not queue.isEmpty():
+        if rule is not None and updates % len(values) == 0 and updates > 0:
+            rule.record(sweepResidual)
+            sweepResidual = 0.0
+            recorded = updates
+            if rule.outOfTime():
+                break
+        c = queue.pop()
+        newUtility = rewards[c] + discount * bestActionUtility(model, values, c)
+        residual = max(residual, abs(newUtility - values[c]))
+        sweepResidual = max(sweepResidual, abs(newUtility - values[c]))
+        values[c] = newUtility
+        updates += 1
+        for k in xrange(model.predecessorStart[c], model.predecessorStart[c + 1]):
+            p = model.predecessors[k]
+            error = bellmanError(p)
+            if error >= threshold:
+                queue.update(p, -error)
+
+    if rule is not None and updates > recorded:
+        rule.record(sweepResidual)
+    sweeps = (updates + len(values) - 1) // len(values)
+    return Solution(model.unflatten(values), sweeps, residual, updates)
+
+
+def actionUtility(model, values, r):
+    """ Returns sum(P(s'|s,a) * U(s')) for the action in row r of a TransitionModel.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        values ([float]): utility of each cell.
+        r (int): the row of the (cell, action) pair.
+
+    Returns:
+        (float): the expected utility of the action.
+    """
+    utility = 0.0
+    for k in xrange(model.outcomeStart[r], model.outcomeStart[r + 1]):
+        utility += model.probabilities[k] * values[model.successors[k]]
+    return utility
+
+
+def improvePolicy(model, values, policy=None):
+    """ Makes a policy greedy with respect to some utilities.
+        A cell keeps its current action unless another one is strictly better, so that policy iteration
+        does not go round in circles between actions that are equally good.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        values ([float]): utility of each cell.
+        policy ([int]): the current action row of each cell, if any.
+
+    Returns:
+        newPolicy ([int]): the greedy action row of each cell.
+        utilities ([float]): the expected utility of the greedy action of each cell.
+    """
+    newPolicy = []
+    utilities = []
+    for c in xrange(len(values)):
+        if policy is None:
+            bestRow = model.actionStart[c]
+        else:
+            bestRow = policy[c]
+        best = actionUtility(model, values, bestRow)
+        for r in xrange(model.actionStart[c], model.actionStart[c + 1]):
+            utility = actionUtility(model, values, r)
+            if utility > best + 1e-12:
+                bestRow = r
+                best = utility
+        newPolicy.append(bestRow)
+        utilities.append(best)
+    return newPolicy, utilities
+
+
+def evaluatePolicy(model, rewards, policy, discount):
+    """ Works out the exact utilities of a policy by solving the linear system U = R + discount * P U.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        rewards ([float]): reward of each cell.
+        policy ([int]): the action row of each cell.
+        discount (float): Discount factor.
+
+    Returns:
+        ([float]): the utility of each cell under the policy.
+    """
+    requireNumpy("policy")
+    system = np.eye(len(rewards))
+    for c, r in enumerate(policy):
+        for k in xrange(model.outcomeStart[r], model.outcomeStart[r + 1]):
+            system[c, model.successors[k]] -= discount * model.probabilities[k]
+    return np.linalg.solve(system, np.array(rewards)).tolist()
+
+
+def sparseLinearSolve(rows, constants):
+    """ Solves the linear system A x = b by Gaussian elimination, keeping A sparse.
+
+        Every row is a {column: coefficient} dict, so only the non-zero coefficients (and the fill-in that
+        elimination creates) are stored and worked on. Rows are not pivoted, which is safe for strictly
+        diagonally dominant systems such as the ones of policy evaluation, I - discount * P.
+
+    Args:
+        rows ([{int: float}]): the coefficients of A, one dict per row. They are left untouched.
+        constants ([float]): b.
+
+    Returns:
+        ([float]): x.
+    """
+    n = len(rows)
+    rows = [dict(row) for row in rows]
+    constants = list(constants)
+    # For every column, the rows below the diagonal that have a coefficient in it.
+    below = [set() for i in range(n)]
+    for i, row in enumerate(rows):
+        for j in row:
+            if j < i:
+                below[j].add(i)
+
+    for k in range(n):
+        pivotRow = rows[k]
+        pivot = pivotRow[k]
+        for i in below[k]:
+            row = rows[i]
+            factor = row.pop(k) / pivot
+            for j, coefficient in pivotRow.items():
+                if j > k:
+                    row[j] = row.get(j, 0.0) - factor * coefficient
+                    if j < i:
+                        below[j].add(i)
+            constants[i] -= factor * constants[k]
+
+    solution = [0.0] * n
+    for k in range(n - 1, -1, -1):
+        total = constants[k]
+        for j, coefficient in rows[k].items():
+            if j > k:
+                total -= coefficient * solution[j]
+        solution[k] = total / rows[k][k]
+    return solution
+
+
+def evaluatePolicySparse(model, rewards, policy, discount):
+    """ Same as evaluatePolicy, but solving the system with sparseLinearSolve, so it needs no NumPy.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        rewards ([float]): reward of each cell.
+        policy ([int]): the action row of each cell.
+        discount (float): Discount factor.
+
+    Returns:
+        ([float]): the utility of each cell under the policy.
+    """
+    rows = []
+    for c, r in enumerate(policy):
+        row = {c: 1.0}
+        for k in xrange(model.outcomeStart[r], model.outcomeStart[r + 1]):
+            successor = model.successors[k]
+            row[successor] = row.get(successor, 0.0) - discount * model.probabilities[k]
+        rows.append(row)
+    return sparseLinearSolve(rows, rewards)
+
+
+def policyIteration(model, entryMap, discount, initialPolicy=None, initialValues=None, evaluationSweeps=None, rule=None,
+                    evaluate=None):
+    """ Policy iteration, or modified policy iteration, over a precompiled TransitionModel.
+
+        Policy iteration evaluates each policy exactly (see evaluatePolicy) and stops when improving it
+        changes nothing. Modified policy iteration instead applies a Bellman update, which also picks the
+        greedy policy, followed by evaluationSweeps sweeps that follow that policy, and stops according to
+        the stopping rule like value iteration does. Unlike MDPAgent.getActionWithHighestUtility, actions
+        are compared with a plain maximum.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        entryMap ([[float/None]]): 2D-Matrix of rewards indexed by [x][y], with walls set to None.
+        discount (float): Discount factor.
+        initialPolicy ([int]): action row of each cell to start from, e.g. the previous move's policy.
+        initialValues ([[float/None]]): utilities to start from. Defaults to the rewards.
+        evaluationSweeps (int): None for exact policy evaluation, otherwise the number of evaluation sweeps.
+        rule (StoppingRule): when modified policy iteration stops. Defaults to stopping when no utility changes.
+              Policy iteration only uses its deadline, and records in it the residual of each improvement.
+        evaluate (function): how policies are evaluated exactly, evaluatePolicy (the default, with NumPy) or
+                             evaluatePolicySparse.
+
+    Returns:
+        (Solution): its values are a 2D-Matrix holding the utility of each cell, with walls set to None,
+                    and its policy the final action row of each cell. Its sweeps count improvement
+                    and evaluation sweeps, but not the linear solves of exact evaluation.
+    """
+    rewards = model.flatten(entryMap)
+    if initialValues is None:
+        values = rewards[:]
+    else:
+        values = [float(value) for value in model.flatten(initialValues)]
+    if rule is None:
+        rule = StoppingRule(discount)
+    if evaluate is None:
+        evaluate = evaluatePolicy
+    index = model.index
+
+    policy = initialPolicy
+    if policy is None:
+        policy = improvePolicy(model, values)[0]
+    sweeps = 0
+    while True:
+        if evaluationSweeps is None:
+            values = evaluate(model, rewards, policy, discount)
+        else:
+            for i in range(evaluationSweeps):
+                values = [rewards[c] + discount * actionUtility(model, values, policy[c]) for c in xrange(len(values))]
+                sweeps += 1
+
+        newPolicy, utilities = improvePolicy(model, values, policy)
+        sweeps += 1
+        newValues = [rewards[c] + discount * utilities[c] for c in xrange(len(values))]
+        residual = max([abs(new - old) for new, old in zip(newValues, values)])
+
+        if evaluationSweeps is None:
+            rule.record(residual)
+            if newPolicy == policy:
+                return Solution(model.unflatten(values), sweeps, residual, policy=policy)
+            if rule.outOfTime():
+                return Solution(model.unflatten(newValues), sweeps, residual, policy=newPolicy)
+        elif rule.done(residual, lambda x, y: newValues[index[x][y]]):
+            return Solution(model.unflatten(newValues), sweeps, residual, policy=newPolicy)
+        policy = newPolicy
+        values = newValues
+
+
+def mazeWindow(model, start, horizon):
+    """ Finds the cells within a maze distance of a cell, with a breadth-first search.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        start (int): the cell to start from.
+        horizon (int): the largest maze distance.
+
+    Returns:
+        ([int]): the cells at most horizon moves away from start, nearest first.
+    """
+    window = [start]
+    distances = {start: 0}
+    queue = util.Queue()
+    queue.push(start)
+    while not queue.isEmpty():
+        c = queue.pop()
+        if distances[c] == horizon:
+            continue
+        for n in model.neighbours(c):
+            if n not in distances:
+                distances[n] = distances[c] + 1
+                window.append(n)
+                queue.push(n)
+    return window
+
+
+def localValueIteration(model, entryMap, discount, position, horizon, boundary, initialValues=None, rule=None):
+    """ Receding-horizon value iteration: only the cells within horizon moves of Pacman are solved.
+
+        Only the action at Pacman's cell is ever used, and far away cells hardly affect it, so value
+        iteration runs (in place, as Gauss-Seidel sweeps) over the window around Pacman only. The cells
+        just outside the window keep a fixed estimate of their utility given by boundary, so the work per
+        move depends on horizon rather than on the size of the board.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        entryMap ([[float/None]]): 2D-Matrix of rewards indexed by [x][y], with walls set to None.
+        discount (float): Discount factor.
+        position ((int, int)): Pacman's position.
+        horizon (int): largest maze distance from Pacman of the cells that are solved (at least 1).
+        boundary (function): boundary(x, y) returns the estimated utility of a cell outside the window.
+        initialValues ([[float/None]]): utilities to start from. Defaults to the rewards.
+        rule (StoppingRule): when to stop. Defaults to stopping when no utility changes.
+
+    Returns:
+        (Solution): its values are a 2D-Matrix holding the utility of the cells in the window and of the
+                    cells around it. Every other cell is set to None.
+    """
+    if rule is None:
+        rule = StoppingRule(discount)
+    window = mazeWindow(model, model.index[position[0]][position[1]], horizon)
+
+    rewards = {}
+    values = {}
+    for c in window:
+        x, y = model.cells[c]
+        rewards[c] = entryMap[x][y]
+        values[c] = entryMap[x][y]
+        if initialValues is not None and initialValues[x][y] is not None:
+            values[c] = float(initialValues[x][y])
+    for c in window:
+        for k in xrange(model.outcomeStart[model.actionStart[c]], model.outcomeStart[model.actionStart[c + 1]]):
+            successor = model.successors[k]
+            if successor not in values:
+                values[successor] = boundary(*model.cells[successor])
+
+    sweeps = 0
+    while True:
+        values, residual = sparseBellmanBackup(model, rewards, values, discount, window, values)
+        sweeps += 1
+        if rule.done(residual, lambda x, y: values[model.index[x][y]]):
+            break
+
+    matrix = [[None] * model.height for i in range(model.width)]
+    for c, value in values.items():
+        x, y = model.cells[c]
+        matrix[x][y] = value
+    return Solution(matrix, sweeps, residual, sweeps * len(window))
+
+
+def corridorChain(model, rewards, discount, cells, endA, endB):
+    """ Utilities along a corridor for Pacman heading steadily towards endB, as functions of the ends.
+
+        Heading one way, every corridor cell only leads to the next cell, to the previous one or to itself,
+        so the utilities of the whole corridor solve a tridiagonal system, which is solved by elimination
+        in one pass forth and one back.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        rewards ([float]): reward of every cell.
+        discount (float): Discount factor.
+        cells ([int]): the corridor cells, from endA to endB.
+        endA (int): node before the first cell.
+        endB (int): node after the last cell.
+
+    Returns:
+        ([(float, float, float)]): for each cell a triple (a, b, c) such that its utility is
+                                   a + b * U(endA) + c * U(endB).
+    """
+    n = len(cells)
+    below, diagonal, above = [0.0] * n, [0.0] * n, [0.0] * n
+    constants = []
+    for i, c in enumerate(cells):
+        previous = cells[i - 1] if i > 0 else endA
+        following = cells[i + 1] if i < n - 1 else endB
+        for r in xrange(model.actionStart[c], model.actionStart[c + 1]):
+            if model.successors[model.outcomeStart[r]] == following:
+                break
+        diagonal[i] = 1.0
+        for k in xrange(model.outcomeStart[r], model.outcomeStart[r + 1]):
+            weight = discount * model.probabilities[k]
+            if model.successors[k] == following:
+                above[i] -= weight
+            elif model.successors[k] == previous:
+                below[i] -= weight
+            else:
+                diagonal[i] -= weight
+        constant = [rewards[c], 0.0, 0.0]
+        if i == 0:
+            constant[1] -= below[i]
+        if i == n - 1:
+            constant[2] -= above[i]
+        constants.append(constant)
+
+    # Forward elimination, then back substitution, carrying the three coefficients along.
+    ratios = [0.0] * n
+    for i in range(n):
+        pivot = diagonal[i]
+        if i > 0:
+            pivot -= below[i] * ratios[i - 1]
+            constants[i] = [constants[i][j] - below[i] * constants[i - 1][j] for j in range(3)]
+        ratios[i] = above[i] / pivot
+        constants[i] = [value / pivot for value in constants[i]]
+    for i in range(n - 2, -1, -1):
+        constants[i] = [constants[i][j] - ratios[i] * constants[i + 1][j] for j in range(3)]
+    return [tuple(constant) for constant in constants]
+
+
+def splitCorridors(graph, rewards):
+    """ Cuts the corridors of graph wherever the reward changes along them.
+
+        corridorChain lets Pacman head for one end of a corridor or stay where it is, which is only right if
+        every cell of the corridor is worth the same: otherwise it may rather walk to the food a few cells
+        down the corridor and stop there. So, for this move, every corridor cell whose reward differs from
+        that of the cell before it becomes a node, and the corridors left between nodes hold cells of one
+        reward each. Food, capsules and the cells around ghosts are then nodes, or start a run of them.
+
+    Args:
+        graph (mdpModels.CorridorGraph): corridor graph of the layout.
+        rewards ([float]): reward of every cell.
+
+    Returns:
+        (([int], [bool], [(int, [int], int)], [(int, int)])): nodes, isNode, corridors and corridorOf, as
+                                                             in mdpModels.CorridorGraph.
+    """
+    isNode = list(graph.isNode)
+    corridors = []
+    corridorOf = [None] * len(isNode)
+    for endA, cells, endB in graph.corridors:
+        start = endA
+        run = []
+        for c in cells:
+            if run and rewards[c] != rewards[run[-1]]:
+                corridors.append((start, run, c))
+                isNode[c] = True
+                start, run = c, []
+            else:
+                run.append(c)
+        if run:
+            corridors.append((start, run, endB))
+    for k, (endA, cells, endB) in enumerate(corridors):
+        for i, c in enumerate(cells):
+            corridorOf[c] = (k, i)
+    return [c for c in range(len(isNode)) if isNode[c]], isNode, corridors, corridorOf
+
+
+def corridorValueIteration(model, graph, entryMap, discount, initialValues=None, rule=None):
+    """ Value iteration over the junctions of the maze only, with corridors solved in closed form.
+
+        In a corridor Pacman can only go on or back, and once it has picked a way it keeps it until the
+        next junction (or it stays where it is forever). Given the utilities of the two junctions at its
+        ends, a corridor cell is then worth the best of these three, and the first two are linear in the
+        utilities of the ends (see corridorChain). So each move the corridors are cut where their reward
+        changes (see splitCorridors) and solved once, and value iteration sweeps over the junctions, dead
+        ends and cut points only, which are a fraction of the cells. The corridor cells are filled in at the end.
+
+        This is an approximation: a corridor cell can't mix going both ways, and the best action is the plain
+        largest expected utility rather than the one MDPAgent.getActionWithHighestUtility would pick.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        graph (mdpModels.CorridorGraph): corridor graph of the same layout.
+        entryMap ([[float/None]]): 2D-Matrix of rewards indexed by [x][y], with walls set to None.
+        discount (float): Discount factor.
+        initialValues ([[float/None]]): utilities to start the junctions from. Defaults to the rewards.
+        rule (StoppingRule): when to stop. Defaults to stopping when no utility changes.
+
+    Returns:
+        (Solution): the utilities of every cell.
+    """
+    if rule is None:
+        rule = StoppingRule(discount)
+    rewards = model.flatten(entryMap)
+    values = list(rewards) if initialValues is None else [float(value) for value in model.flatten(initialValues)]
+
+    nodes, isNode, corridors, corridorOf = splitCorridors(graph, rewards)
+    towardsB = []
+    towardsA = []
+    for endA, cells, endB in corridors:
+        towardsB.append(corridorChain(model, rewards, discount, cells, endA, endB))
+        towardsA.append(corridorChain(model, rewards, discount, cells[::-1], endB, endA)[::-1])
+
+    def utility(c):
+        if isNode[c]:
+            return values[c]
+        k, i = corridorOf[c]
+        endA, cells, endB = corridors[k]
+        a, b, d = towardsB[k][i]
+        forwards = a + b * values[endA] + d * values[endB]
+        a, d, b = towardsA[k][i]
+        backwards = a + b * values[endA] + d * values[endB]
+        return max(forwards, backwards, rewards[c] / (1 - discount))
+
+    sweeps = 0
+    while True:
+        residual = 0.0
+        for c in nodes:
+            best = None
+            for r in xrange(model.actionStart[c], model.actionStart[c + 1]):
+                expected = 0.0
+                for k in xrange(model.outcomeStart[r], model.outcomeStart[r + 1]):
+                    expected += model.probabilities[k] * utility(model.successors[k])
+                if best is None or expected > best:
+                    best = expected
+            value = rewards[c] + discount * best
+            residual = max(residual, abs(value - values[c]))
+            values[c] = value
+        sweeps += 1
+        if rule.done(residual, lambda x, y: utility(model.index[x][y])):
+            break
+
+    return Solution(model.unflatten([utility(c) for c in range(len(model.cells))]), sweeps, residual,
+                    sweeps * len(nodes))
+
+
+def regionValueIteration(model, graph, entryMap, discount, initialValues=None, rule=None):
+    """ Value iteration one region at a time, in the order of the regions of graph.
+
+        Regions only share articulation cells, so a region can be swept in place until it converges on its
+        own, whatever the rest of the maze is doing. Only when that changes the utility of an articulation
+        cell do the other regions around it need to be swept again. Passes go over the pending regions
+        alternately in the order of graph (dead ends before what they hang off) and in reverse, until no
+        region is pending, so regions that converge quickly stop costing anything.
+
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        graph (mdpModels.RegionGraph): region graph of the same layout.
+        entryMap ([[float/None]]): 2D-Matrix of rewards indexed by [x][y], with walls set to None.
+        discount (float): Discount factor.
+        initialValues ([[float/None]]): utilities to start from. Defaults to the rewards.
+        rule (StoppingRule): its threshold is the residual under which a region has converged (it has to
+              stop changing at all without one), and its deadline is checked after every region sweep. The
+              largest residual of a region sweep in each pass is recorded in it.
+
+    Returns:
+        (Solution): its values are a 2D-Matrix holding the utility of each cell, its regionSweeps the sweeps
+                    spent on each region, and its sweeps how many full sweeps the updates add up to.
+    """
+    if rule is None:
+        rule = StoppingRule(discount)
+    tolerance = rule.threshold if rule.threshold is not None else 0.0
+    rewards = model.flatten(entryMap)
+    values = list(rewards) if initialValues is None else [float(value) for value in model.flatten(initialValues)]
+
+    regionSweeps = [0] * len(graph.regions)
+    pending = set(range(len(graph.regions)))
+    order = range(len(graph.regions))
+    updates = 0
+    residual = 0.0
+    while pending and not rule.timedOut:
+        passResidual = 0.0
+        for g in order:
+            if g not in pending:
+                continue
+            pending.discard(g)
+            region = graph.regions[g]
+            before = [values[c] for c in region]
+            while True:
+                values, regionResidual = sparseBellmanBackup(model, rewards, values, discount, region, values)
+                regionSweeps[g] += 1
+                updates += len(region)
+                passResidual = max(passResidual, regionResidual)
+                if regionResidual <= tolerance or rule.outOfTime():
+                    break
+            residual = max(residual, regionResidual)
+            for c, old in zip(region, before):
+                if len(graph.regionsOf[c]) > 1 and abs(values[c] - old) > tolerance:
+                    pending.update(graph.regionsOf[c])
+            pending.discard(g)
+            if rule.timedOut:
+                break
+        rule.record(passResidual)
+        order = order[::-1]
+
+    sweeps = (updates + len(values) - 1) // len(values)
+    return Solution(model.unflatten(values), sweeps, residual, updates, regionSweeps=regionSweeps)
+
+
+class Problem:
+    """ One move's MDP, as handed to a registered Solver.
+
+        The reward model is entryMap and the transition model is model. The rest is what some solvers need
+        on top of them: the solver options of the agent, where to start from, when to stop, and a state dict
+        that the caller keeps from move to move (and empties for each new game) for solvers that reuse data.
+    """
+
+    def __init__(self, model, entryMap, discount, position=None, legal=None, initialValues=None, rule=None,
+                 options=None, state=None, agent=None, previousEntryMap=None, previousPolicy=None, dirtyCells=None):
+        """
+        Args:
+            model (mdpModels.TransitionModel): transition model of the layout.
+            entryMap ([[float/None]]): 2D-Matrix of rewards indexed by [x][y], with walls set to None.
+            discount (float): Discount factor.
+            position ((int, int)): Pacman's position.
+            legal ([Directions]): Pacman's legal actions.
+            initialValues ([[float/None]]): utilities to start from, e.g. the previous move's. Defaults to the rewards.
+            rule (StoppingRule): when to stop. Defaults to stopping when no utility changes.
+            options (dict): solver options by name: sweep, epsilon, evaluationSweeps, horizon, workers, boundary
+                            (boundary(x, y) estimates the utility of a cell the local solver leaves out) and
+                            buffers (the mdpModels.GridBuffers of the agent).
+            state (dict): data solvers keep between moves.
+            agent (MDPAgent): the agent asking, for solvers that use its methods.
+            previousEntryMap ([[float/None]]): the rewards initialValues were computed for.
+            previousPolicy ([int]): the policy initialValues were computed for, as in Solution.policy.
+            dirtyCells (set): the (x, y) cells whose reward changed since previousEntryMap, if known.
+        """
+        self.model = model
+        self.entryMap = entryMap
+        self.discount = discount
+        self.position = position
+        self.legal = legal
+        self.initialValues = initialValues
+        self.rule = rule if rule is not None else StoppingRule(discount)
+        self.options = options if options is not None else {}
+        self.state = state if state is not None else {}
+        self.agent = agent
+        self.previousEntryMap = previousEntryMap
+        self.previousPolicy = previousPolicy
+        self.dirtyCells = dirtyCells
+
+    def option(self, name, default=None):
+        """
+        Returns:
+            the value of a solver option, or default if it was not given.
+        """
+        value = self.options.get(name)
+        return value if value is not None else default
+
+
+class Solver:
+    """ An engine MDPAgent can pick by name (-a solver=name), as listed in solvers.
+
+        Besides the function that solves a Problem, it tells the agent how to use it: whether it always starts
+        from the previous move, whether it needs NumPy, which epsilon it uses by default, which sweep orders
+        it can run, whether its result depends on Pacman's position, whether its utilities are overwritten
+        by the next solve and whether it works in GridBuffers of the agent.
+    """
+
+    def __init__(self, name, function, warmStart=False, needsNumpy=False, epsilon=None, sweeps=None,
+                 positional=False, volatile=False, buffered=False):
+        """
+        Args:
+            name (str): the name the solver is picked by.
+            function (function): function(problem) returns the Solution of a Problem.
+            warmStart (bool): True if it always starts from the previous move's solution.
+            needsNumpy (bool): True if it cannot run without NumPy.
+            epsilon (float): epsilon to use when none is given, or None to iterate until nothing changes.
+            sweeps ([str]): the sweep orders it can run, the first one being its default. Defaults to all of
+                            sweepOrders. [] for a solver that updates the cells in an order of its own.
+            positional (bool): True if its utilities depend on Pacman's position.
+            volatile (bool): True if the next solve overwrites the utilities it returns.
+            buffered (bool): True if it solves in the mdpModels.GridBuffers the agent passes as the buffers
+                             option. The agent then keeps its entryMap in their rewards.
+        """
+        self.name = name
+        self.function = function
+        self.warmStart = warmStart
+        self.needsNumpy = needsNumpy
+        self.epsilon = epsilon
+        self.sweeps = sweeps if sweeps is not None else sweepOrders
+        self.positional = positional
+        self.volatile = volatile
+        self.buffered = buffered
+
+    def solve(self, problem):
+        """ Solves a Problem and picks the greedy action at Pacman's position.
+
+        Returns:
+            (Solution): the solution, whose action is the best legal action at problem.position (or None if
+                        the problem has no position), timed as described in Solution.
+        """
+        start = time.time()
+        solution = self.function(problem)
+        if solution.updates is None:
+            solution.updates = solution.sweeps * len(problem.model.cells)
+        solved = time.time()
+        if problem.position is not None and problem.legal is not None:
+            solution.action = greedyAction(lambda x, y: solution.values[x][y], problem.position, problem.legal)
+        solution.solveSeconds = solved - start
+        solution.actionSeconds = time.time() - solved
+        return solution
+
+
+# The solvers MDPAgent can use, by name, and their names in the order they were registered.
+solvers = {}
+solverNames = []
+
+
+def registerSolver(solver):
+    """ Makes a Solver available to MDPAgent, replacing any solver with the same name.
+
+    Args:
+        solver (Solver): the solver.
+    """
+    if solver.name not in solvers:
+        solverNames.append(solver.name)
+    solvers[solver.name] = solver
+
+
+def getSolver(name):
+    """
+    Args:
+        name (str): the name of a registered Solver.
+
+    Returns:
+        (Solver): the solver.
+    """
+    if name not in solvers:
+        raise Exception("Unknown MDPAgent solver: " + str(name) + ". Choose one of " + ", ".join(solverNames))
+    return solvers[name]
+
+
+def solveNumpy(problem):
+    return numpyValueIteration(problem.entryMap, problem.discount, problem.initialValues, problem.rule,
+                               problem.option("sweep", "jacobi"))
+
+
+def solveSparse(problem):
+    return sparseValueIteration(problem.model, problem.entryMap, problem.discount, problem.initialValues, problem.rule,
+                                problem.option("sweep", "jacobi"))
+
+
+def solvePrioritized(problem):
+    previousEntryMap = problem.previousEntryMap if problem.initialValues is not None else None
+    changedCells = None
+    if previousEntryMap is not None and problem.dirtyCells is not None:
+        index = problem.model.index
+        changedCells = [index[x][y] for (x, y) in problem.dirtyCells if index[x][y] >= 0]
+    return prioritizedSweeping(problem.model, problem.entryMap, problem.discount, problem.initialValues, previousEntryMap,
+                               problem.option("epsilon", defaultEpsilon), problem.rule, changedCells)
+
+
+def solvePolicy(problem):
+    initialPolicy = problem.previousPolicy if problem.initialValues is not None else None
+    return policyIteration(problem.model, problem.entryMap, problem.discount, initialPolicy, problem.initialValues,
+                           None, problem.rule)
+
+
+def solveModifiedPolicy(problem):
+    initialPolicy = problem.previousPolicy if problem.initialValues is not None else None
+    return policyIteration(problem.model, problem.entryMap, problem.discount, initialPolicy, problem.initialValues,
+                           problem.option("evaluationSweeps", 5), problem.rule)
+
+
+def solveExact(problem):
+    initialPolicy = problem.previousPolicy if problem.initialValues is not None else None
+    return policyIteration(problem.model, problem.entryMap, problem.discount, initialPolicy, problem.initialValues,
+                           None, problem.rule, evaluatePolicySparse)
+
+
+def solveLocal(problem):
+    # Without a boundary estimate, a cell outside the window is taken to keep its reward forever.
+    entryMap = problem.entryMap
+    boundary = problem.option("boundary", lambda x, y: entryMap[x][y] / (1 - problem.discount))
+    return localValueIteration(problem.model, entryMap, problem.discount, problem.position,
+                               problem.option("horizon", 10), boundary, problem.initialValues, problem.rule)
+
+
+def solveCorridor(problem):
+    return corridorValueIteration(problem.model, mdpModels.getCorridorGraph(problem.model), problem.entryMap,
+                                  problem.discount, problem.initialValues, problem.rule)
+
+
+def solveRegions(problem):
+    return regionValueIteration(problem.model, mdpModels.getRegionGraph(problem.model), problem.entryMap,
+                                problem.discount, problem.initialValues, problem.rule)
+
+
+def solveBuffered(problem):
+    buffers = problem.option("buffers")
+    if buffers is None:
+        buffers = mdpModels.GridBuffers(problem.model)
+    return bufferedValueIteration(problem.model, buffers, problem.entryMap, problem.discount, problem.initialValues,
+                                  problem.rule, problem.option("sweep", "jacobi"))
+
+
+registerSolver(Solver("numpy", solveNumpy, needsNumpy=True, sweeps=["jacobi", "redBlack"]))
+registerSolver(Solver("sparse", solveSparse))
+registerSolver(Solver("prioritized", solvePrioritized, warmStart=True, epsilon=defaultEpsilon, sweeps=[]))
+registerSolver(Solver("policy", solvePolicy, warmStart=True, needsNumpy=True, sweeps=[]))
+registerSolver(Solver("modifiedPolicy", solveModifiedPolicy, warmStart=True, epsilon=defaultEpsilon, sweeps=[]))
+registerSolver(Solver("exact", solveExact, warmStart=True, sweeps=[]))
+registerSolver(Solver("local", solveLocal, positional=True, sweeps=[]))
+registerSolver(Solver("corridor", solveCorridor, sweeps=[]))
+registerSolver(Solver("regions", solveRegions, sweeps=[]))
+registerSolver(Solver("buffered", solveBuffered, volatile=True, buffered=True))
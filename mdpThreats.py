@@ -0,0 +1,101 @@
+# mdpThreats.py
+#
+# Ghost costs spread over the maze for MDPAgent (mdpAgents.py): every
+# cell within some maze distance of a ghost gets a cost that fades with
+# that distance. The distances of a layout are worked out once, so on
+# every move the costs of all the ghosts are found with a few NumPy
+# operations, however far they spread.
+#
+# As required by the licensing agreement for the PacMan AI we have:
+#
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+import mdpModels
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ThreatField:
+    """ The costs ghosts put on the cells of one layout, by maze distance.
+
+        A ghost has a threat level (e.g. hungry, or about to stop being scared), and each level has two
+        costs: the one of the ghost's cell, and the one of the cells next to it. With a radius r, a cell at
+        distance d from the ghost, for 1 <= d <= r, gets the second cost scaled by (r - d + 1) / r, so that
+        the cost fades to nothing just beyond the radius. With r = 1 this is the ghost's cell and the cells
+        next to it, as MDPAgent.ghostRewards does.
+
+        The distance between every two cells, capped at r + 1, is kept in a cells x cells array, and the
+        cost of every level at every distance in a small profile table. The costs of a ghost are then one
+        lookup of its row of distances in the profile of its level, and where ghosts overlap the highest
+        cost (the lowest reward) wins. This takes the same time whatever the radius.
+    """
+
+    def __init__(self, model, radius, levels):
+        """
+        Args:
+            model (mdpModels.TransitionModel): transition model of the layout.
+            radius (int): the largest maze distance from a ghost that gets a cost (at least 1).
+            levels ([(float, float)]): for each threat level, the cost of the ghost's cell and of the cells next to it.
+        """
+        self.model = model
+        self.radius = radius
+        distances = np.array([list(row) for row in mdpModels.getDistanceTable(model)], dtype=np.int32)
+        # Cells that are too far, or that cannot be reached at all, have distance radius + 1 and no cost.
+        self.distances = np.where((distances < 0) | (distances > radius), radius + 1, distances).astype(np.int16)
+        self.profiles = np.empty((len(levels), radius + 2))
+        self.profiles[:, radius + 1] = np.nan
+        for level, (ghostCost, nextToCost) in enumerate(levels):
+            self.profiles[level, 0] = ghostCost
+            for d in range(1, radius + 1):
+                self.profiles[level, d] = nextToCost * (radius - d + 1) / float(radius)
+
+    def costs(self, ghosts):
+        """ Merges the costs of several ghosts.
+
+        Args:
+            ghosts ([((int, int), int)]): the cell of each ghost and its threat level.
+
+        Returns:
+            ([((int, int), float)]): (cell, cost) pairs of every cell within the radius of a ghost, in the
+                                     order of model.cells.
+        """
+        index = self.model.index
+        cells = [index[x][y] for ((x, y), level) in ghosts if index[x][y] >= 0]
+        levels = [level for ((x, y), level) in ghosts if index[x][y] >= 0]
+        if not cells:
+            return []
+        field = np.fmin.reduce(self.profiles[np.array(levels)[:, None], self.distances[cells]], axis=0)
+        threatened = np.flatnonzero(~np.isnan(field))
+        return [(self.model.cells[c], value) for c, value in zip(threatened.tolist(), field[threatened].tolist())]
+
+
+# The ThreatField of each layout, radius and costs, kept for the whole run.
+threatFields = {}
+
+
+def getThreatField(model, radius, levels):
+    """
+    Args:
+        model (mdpModels.TransitionModel): transition model of the layout.
+        radius (int): the largest maze distance from a ghost that gets a cost.
+        levels ([(float, float)]): for each threat level, the cost of the ghost's cell and of the cells next to it.
+
+    Returns:
+        (ThreatField): the threat field for these, built if there is none yet.
+    """
+    key = (model, radius, tuple(levels))
+    if key not in threatFields:
+        threatFields[key] = ThreatField(model, radius, levels)
+    return threatFields[key]
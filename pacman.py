@@ -168,6 +168,14 @@ class GameState:
     def getScore( self ):
         return float(self.data.score)
 
+    def getRandom( self ):
+        """
+        Returns the random number generator of this game: its own stream if runGames
+        gave it one, otherwise the random module. Both have random(), choice(), ...
+        """
+        if self.data.random == None: return random
+        return self.data.random
+
     def getCapsules(self):
         """
         Returns a list of positions (x,y) of the remaining capsules.
@@ -518,6 +526,10 @@ def readCommand( argv ):
                       help=default('Zoom the size of the graphics window'), default=1.0)
     parser.add_option('-f', '--fixRandomSeed', action='store_true', dest='fixRandomSeed',
                       help='Fixes the random seed to always play the same game', default=False)
+    parser.add_option('--seed', dest='seed',
+                      help='Gives every game its own random stream, seeded from this seed and the game number, so any game can be replayed on its own', default=None)
+    parser.add_option('--firstGame', dest='firstGame', type='int',
+                      help=default('Number of the first game played, to replay a game of a run made with --seed'), default=0)
     parser.add_option('-r', '--recordActions', action='store_true', dest='record',
                       help='Writes game histories to a file (named by the time they were played)', default=False)
     parser.add_option('--replay', dest='gameToReplay',
@@ -579,6 +591,8 @@ def readCommand( argv ):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['seed'] = options.seed
+    args['firstGame'] = options.firstGame
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
@@ -634,7 +648,22 @@ def replayGame( layout, actions, display ):
 
     display.finish()
 
-def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30 ):
+def gameRandom( seed, gameNumber ):
+    """
+    Returns the random number generator of game gameNumber of a run with the given seed.
+    It only depends on the two, and is the same on every machine.
+    """
+    import hashlib
+    return random.Random( int( hashlib.sha1( '%s:%d' % ( seed, gameNumber ) ).hexdigest(), 16 ) )
+
+def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0, catchExceptions=False, timeout=30,
+              seed=None, firstGame=0 ):
+    """
+    Plays numGames games. With a seed, game i (counting from firstGame) draws all its random numbers
+    (Pacman's motion model, the ghosts, the layout) from gameRandom(seed, i) rather than from the
+    random module, so it plays the same whatever was played before it, and can be replayed alone
+    with firstGame=i and numGames=1. Each game remembers (seed, i) in game.seed.
+    """
     import __main__
     __main__.__dict__['_display'] = display
 
@@ -652,6 +681,10 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
             gameDisplay = display
             rules.quiet = False
         game = rules.newGame( layout, pacman, ghosts, gameDisplay, beQuiet, catchExceptions)
+        game.seed = None
+        if seed != None:
+            game.seed = ( seed, firstGame + i )
+            game.state.data.random = gameRandom( seed, firstGame + i )
         game.run()
         if not beQuiet: games.append(game)
 
@@ -659,7 +692,7 @@ def runGames( layout, pacman, ghosts, display, numGames, record, numTraining = 0
             import time, cPickle
             fname = ('recorded-game-%d' % (i + 1)) +  '-'.join([str(t) for t in time.localtime()[1:6]])
             f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
+            components = {'layout': layout, 'actions': game.moveHistory, 'seed': game.seed}
             cPickle.dump(components, f)
             f.close()
 
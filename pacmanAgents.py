@@ -14,7 +14,6 @@
 
 from pacman import Directions
 from game import Agent
-import random
 import game
 import util
 
@@ -38,6 +37,7 @@ class GreedyAgent(Agent):
         assert self.evaluationFunction != None
 
     def getAction(self, state):
+        rng = state.getRandom()
         # Generate candidate actions
         legal = state.getLegalPacmanActions()
         if Directions.STOP in legal: legal.remove(Directions.STOP)
@@ -46,7 +46,7 @@ class GreedyAgent(Agent):
         scored = [(self.evaluationFunction(state), action) for state, action in successors]
         bestScore = max(scored)[0]
         bestActions = [pair[1] for pair in scored if pair[0] == bestScore]
-        return random.choice(bestActions)
+        return rng.choice(bestActions)
 
 def scoreEvaluation(state):
     return state.getScore()
@@ -29,7 +29,6 @@
 from pacman import Directions
 from game import Agent
 import api
-import random
 import game
 import util
 
@@ -44,8 +43,9 @@ class RandomAgent(Agent):
         legal = api.legalActions(state)
         if Directions.STOP in legal:
             legal.remove(Directions.STOP)
-        # Random choice between the legal options.
-        return api.makeMove(random.choice(legal), legal)
+        # Random choice between the legal options, drawn from the
+        # random number generator of the game.
+        return api.makeMove(state.getRandom().choice(legal), legal, state.getRandom())
 
 # RandomishAgent
 #
@@ -59,6 +59,11 @@ class RandomishAgent(Agent):
     # Create a variable to hold the last action
     def __init__(self):
          self.last = Directions.STOP
+
+    # Start every game afresh, so that a game plays the same whatever
+    # games came before it.
+    def registerInitialState(self, state):
+         self.last = Directions.STOP
     
     def getAction(self, state):
         # Get the actions we can try, and remove "STOP" if that is one of them.
@@ -68,12 +73,12 @@ class RandomishAgent(Agent):
         # If we can repeat the last action, do it. Otherwise make a
         # random choice.
         if self.last in legal:
-            return api.makeMove(self.last, legal)
+            return api.makeMove(self.last, legal, state.getRandom())
         else:
-            pick = random.choice(legal)
+            pick = state.getRandom().choice(legal)
             # Since we changed action, record what we did
             self.last = pick
-            return api.makeMove(pick, legal)
+            return api.makeMove(pick, legal, state.getRandom())
 
 # SensingAgent
 #
@@ -118,4 +123,4 @@ class SensingAgent(Agent):
         
         # getAction has to return a move. Here we pass "STOP" to the
         # API to ask Pacman to stay where they are.
-        return api.makeMove(Directions.STOP, legal)
+        return api.makeMove(Directions.STOP, legal, state.getRandom())
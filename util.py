@@ -489,14 +489,14 @@ def nSample(distribution, values, n):
             cdf += distribution[distPos]
     return samples
 
-def sample(distribution, values = None):
+def sample(distribution, values = None, rng = random):
     if type(distribution) == Counter:
         items = sorted(distribution.items())
         distribution = [i[1] for i in items]
         values = [i[0] for i in items]
     if sum(distribution) != 1:
         distribution = normalize(distribution)
-    choice = random.random()
+    choice = rng.random()
     i, total= 0, distribution[0]
     while choice > total:
         i += 1
@@ -522,11 +522,11 @@ def flipCoin( p ):
     r = random.random()
     return r < p
 
-def chooseFromDistribution( distribution ):
-    "Takes either a counter or a list of (prob, key) pairs and samples"
+def chooseFromDistribution( distribution, rng = random ):
+    "Takes either a counter or a list of (prob, key) pairs and samples, drawing from rng"
     if type(distribution) == dict or type(distribution) == Counter:
-        return sample(distribution)
-    r = random.random()
+        return sample(distribution, rng = rng)
+    r = rng.random()
     base = 0.0
     for prob, element in distribution:
         base += prob